@@ -22,8 +22,38 @@
 Tag German text.
 """
 
+import collections
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
 import re
+import time
+from nltk.classify.naivebayes import NaiveBayesClassifier
+from nltk.probability import (FreqDist, ELEProbDist, LaplaceProbDist,
+                              MLEProbDist)
 from nltk.tag.sequential import ClassifierBasedTagger
+from nltk.tag.util import untag
+
+try:
+    from NegraCorpusReader.Instrumentation import instrumented
+except ImportError:
+    # The tagger is used without the NegraCorpusReader package; its
+    # stages are then left untimed.
+    def instrumented(stage):
+        return lambda function: function
+
+# The tagger used by the worker processes of iter_tag_sents(); it is
+# set before the workers are forked, so they share its memory.
+_worker_tagger = None
+
+def _init_worker(tagger):
+    global _worker_tagger
+    _worker_tagger = tagger
+
+def _tag_chunk(chunk):
+    return [_worker_tagger.tag(sentence) for sentence in chunk]
 
 class ClassifierBasedGermanTagger(ClassifierBasedTagger):
     """A classifier based German part-of-speech tagger. It has an accuracy of
@@ -32,6 +62,266 @@ class ClassifierBasedGermanTagger(ClassifierBasedTagger):
     feature detector.
     """
 
+    def tag_sents(self, sentences, processes=1, chunk_size=100,
+                  progress=None):
+        """Overridden; tags the sentences in parallel worker processes if
+        C{processes} is greater than 1. See L{iter_tag_sents}.
+        @param sentences: The sentences to tag, as lists of tokens.
+        @return: The tagged sentences, in input order.
+        @rtype: C{list} of C{list} of C{tuple}
+        """
+
+        return list(self.iter_tag_sents(sentences, processes, chunk_size,
+                                        progress))
+
+    def iter_tag_sents(self, sentences, processes=1, chunk_size=100,
+                       progress=None):
+        """Tags a stream of sentences, sharding them across a pool of
+        worker processes. The workers are forked after the model is
+        loaded, so they share it instead of each unpickling a copy.
+        Sentences are read from C{sentences} in chunks and only as fast
+        as results are consumed: at most two chunks per process are in
+        flight at any time.
+        @param sentences: An iterable of sentences, as lists of tokens,
+            e.g. C{TigerXMLCorpusReader.sents()}.
+        @param processes: The number of worker processes, or C{None}
+            for one per CPU. With 1, sentences are tagged in this
+            process.
+        @param chunk_size: The number of sentences per task.
+        @param progress: An optional function called after each chunk
+            with the number of sentences and tokens tagged so far and
+            the seconds elapsed, e.g. to report tokens per second.
+        @return: The tagged sentences, in input order.
+        @rtype: iterator of C{list} of C{tuple}
+        """
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+        sentences = iter(sentences)
+        chunks = iter(lambda: list(itertools.islice(sentences, chunk_size)),
+                      [])
+        start = time.perf_counter()
+        num_sents = num_tokens = 0
+
+        def tagged_chunks():
+            if processes <= 1:
+                for chunk in chunks:
+                    yield [self.tag(sentence) for sentence in chunk]
+                return
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = multiprocessing.get_context()
+            with context.Pool(processes, _init_worker, (self,)) as pool:
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(_tag_chunk, (chunk,)))
+                    if len(pending) >= 2 * processes:
+                        yield pending.popleft().get()
+                while pending:
+                    yield pending.popleft().get()
+
+        for tagged_chunk in tagged_chunks():
+            if progress is not None:
+                num_sents += len(tagged_chunk)
+                num_tokens += sum(len(sentence) for sentence in tagged_chunk)
+                progress(num_sents, num_tokens, time.perf_counter() - start)
+            for tagged_sentence in tagged_chunk:
+                yield tagged_sentence
+
+    def tag_nbest(self, tokens, beam_width=4, n=None, prune=0.001):
+        """Tags a sentence with a beam search over tag sequences, returning
+        the best sequences found. The features of each token which do not
+        depend on the tag history are computed once and shared between
+        all hypotheses. Hypotheses whose probability falls below C{prune}
+        times that of the best one are dropped, so the beam narrows to a
+        single hypothesis where the classifier is confident. The backoff
+        tagger is not consulted.
+        @param tokens: The tokens of the sentence to tag.
+        @param beam_width: The maximum number of hypotheses kept per token.
+        @param n: The number of tag sequences to return; defaults to
+            C{beam_width}.
+        @param prune: The minimum probability of a hypothesis relative to
+            the best one, or 0 to disable pruning.
+        @return: Pairs of tagged sentence and log2 probability, best first.
+        @rtype: C{list} of C{tuple}
+        """
+
+        if n is None:
+            n = beam_width
+        threshold = math.log2(prune) if prune else float('-inf')
+        # hypotheses as (log2 probability, tag history)
+        beam = [(0.0, ())]
+        for index, word in enumerate(tokens):
+            static_features = self._static_features(tokens, index)
+            candidates = []
+            for score, history in beam:
+                featureset = dict(static_features)
+                featureset.update(self._history_features(
+                    word,
+                    history[-1] if index > 0 else None,
+                    history[-2] if index > 1 else None))
+                pdist = self._prob_classify(featureset)
+                candidates.extend((score + pdist.logprob(tag), history, tag)
+                                  for tag in pdist.samples())
+            candidates = heapq.nlargest(beam_width, candidates,
+                                        key=lambda candidate: candidate[0])
+            best = candidates[0][0]
+            beam = [(score, history + (tag,))
+                    for (score, history, tag) in candidates
+                    if score - best >= threshold]
+        return [(list(zip(tokens, history)), score)
+                for (score, history) in beam[:n]]
+
+    @instrumented('classification')
+    def _prob_classify(self, featureset):
+        """Computes the tag probability distribution of a featureset.
+        @param featureset: The features of the token to tag.
+        """
+
+        return self._classifier.prob_classify(featureset)
+
+    def update(self, tagged_sents, removed_sents=(), heldout=None,
+               estimator=None):
+        """Warm-starts training from the current model: the counts of the
+        naive Bayes classifier are updated with the new tagged sentences
+        and the removed ones, without revisiting the rest of the training
+        corpus. To correct a sentence, remove its old version and add the
+        new one. Feature names and values known to the model keep their
+        place in the smoothed distributions even if all their training
+        occurrences are removed, so that probabilities of unrelated
+        features do not shift.
+        @param tagged_sents: The new or corrected tagged sentences.
+        @param removed_sents: Tagged sentences to remove from the training
+            data, exactly as they were trained on.
+        @param heldout: Optional tagged sentences to measure the accuracy
+            of the tagger on, before and after the update.
+        @param estimator: The estimator the model was trained with, as
+            passed to C{NaiveBayesClassifier.train()}; it is taken from
+            the model for C{ELEProbDist}, C{LaplaceProbDist} and
+            C{MLEProbDist}, and must be given for any other.
+        @return: The held-out accuracy before and after the update, if
+            C{heldout} is given.
+        @rtype: C{tuple} of (C{float}, C{float})
+        """
+
+        if not isinstance(self._classifier, NaiveBayesClassifier):
+            raise ValueError("Incremental training requires a "
+                             "NaiveBayesClassifier, not %r." %
+                             type(self._classifier).__name__)
+        label_probdist = self._classifier._label_probdist
+        if estimator is None:
+            estimator = type(label_probdist)
+            if estimator not in (ELEProbDist, LaplaceProbDist, MLEProbDist):
+                raise ValueError("The model's %s estimator can't be rebuilt "
+                                 "from counts alone; pass it as estimator."
+                                 % estimator.__name__)
+        if heldout is not None:
+            heldout = list(heldout)
+            accuracy_before = self._accuracy(heldout)
+
+        feature_probdist = self._classifier._feature_probdist
+        label_freqdist = FreqDist(label_probdist.freqdist())
+        feature_freqdist = dict((key, FreqDist(probdist.freqdist()))
+                                for (key, probdist)
+                                in feature_probdist.items())
+        feature_values = collections.defaultdict(set)
+        for (label, fname), freqdist in feature_freqdist.items():
+            feature_values[fname].update(freqdist)
+
+        # count the new featuresets in and the removed ones out
+        for sentences, sign in ((tagged_sents, 1), (removed_sents, -1)):
+            for featureset, label in self._labeled_featuresets(sentences):
+                label_freqdist[label] += sign
+                for fname, fval in featureset.items():
+                    freqdist = feature_freqdist.setdefault((label, fname),
+                                                           FreqDist())
+                    freqdist[fval] += sign
+                    if sign > 0:
+                        feature_values[fname].add(fval)
+
+        # as in NaiveBayesClassifier.train(), a feature missing from a
+        # featureset counts as the value None
+        for label, num_samples in list(label_freqdist.items()):
+            if num_samples < 0:
+                raise ValueError("Removed sentences were not trained on.")
+            if num_samples == 0:
+                del label_freqdist[label]
+                continue
+            for fname in feature_values:
+                freqdist = feature_freqdist.setdefault((label, fname),
+                                                       FreqDist())
+                freqdist[None] += num_samples - freqdist.N()
+                if any(count < 0 for count in freqdist.values()):
+                    raise ValueError("Removed sentences were not trained on.")
+                if freqdist[None] > 0:
+                    feature_values[fname].add(None)
+                for fval in [fval for (fval, count) in freqdist.items()
+                             if count == 0]:
+                    del freqdist[fval]
+
+        self._classifier._label_probdist = estimator(label_freqdist)
+        self._classifier._feature_probdist = dict(
+            ((label, fname), estimator(freqdist,
+                                       bins=len(feature_values[fname])))
+            for ((label, fname), freqdist) in feature_freqdist.items()
+            if label in label_freqdist)
+        self._classifier._labels = list(label_freqdist)
+
+        if heldout is not None:
+            return accuracy_before, self._accuracy(heldout)
+
+    def _labeled_featuresets(self, tagged_sents):
+        """Yields the training featuresets of tagged sentences with their
+        tags, computed as in training from the gold tag history.
+        @param tagged_sents: The tagged sentences.
+        """
+
+        for sentence in tagged_sents:
+            if not sentence:
+                continue
+            tokens, tags = zip(*sentence)
+            for index in range(len(tokens)):
+                yield self.feature_detector(tokens, index, tags), tags[index]
+
+    def _accuracy(self, tagged_sents):
+        """Computes the share of tokens tagged as in the gold standard.
+        @param tagged_sents: The gold standard tagged sentences.
+        """
+
+        tagged = self.tag_sents(untag(sentence) for sentence in tagged_sents)
+        gold = [tag for sentence in tagged_sents for (word, tag) in sentence]
+        tags = [tag for sentence in tagged for (word, tag) in sentence]
+        if not gold:
+            return 0.0
+        return sum(1 for (tag, gold_tag) in zip(tags, gold)
+                   if tag == gold_tag) / len(gold)
+
+    def choose_tag(self, tokens, index, history):
+        """Overridden; times feature detection and classification as
+        separate instrumentation stages.
+        @param tokens: The tokens from the sentence to tag.
+        @param index: The current token index to tag.
+        @param history: The previous tagged tokens.
+        """
+
+        featureset = self.feature_detector(tokens, index, history)
+        return self._classify(featureset)
+
+    @instrumented('classification')
+    def _classify(self, featureset):
+        """Classifies a featureset, falling back to the backoff tagger
+        (by returning None) below the cutoff probability.
+        @param featureset: The features of the token to tag.
+        """
+
+        if self._cutoff_prob is None:
+            return self._classifier.classify(featureset)
+        pdist = self._classifier.prob_classify(featureset)
+        tag = pdist.max()
+        return tag if pdist.prob(tag) >= self._cutoff_prob else None
+
+    @instrumented('feature_detection')
     def feature_detector(self, tokens, index, history):
         """Implementing a slightly modified feature detector.
         @param tokens: The tokens from the sentence to tag.
@@ -39,21 +329,30 @@ class ClassifierBasedGermanTagger(ClassifierBasedTagger):
         @param history: The previous tagged tokens.
         """
 
+        prevtag = history[index-1] if index > 0 else None
+        prevprevtag = history[index-2] if index > 1 else None
+        features = self._static_features(tokens, index)
+        features.update(self._history_features(tokens[index], prevtag,
+                                               prevprevtag))
+        return features
+
+    def _static_features(self, tokens, index):
+        """Computes the features of a token which do not depend on the
+        tags chosen for the previous tokens.
+        @param tokens: The tokens from the sentence to tag.
+        @param index: The current token index to tag.
+        """
+
         word = tokens[index]
         if index == 0: # At the beginning of the sentence
             prevword = prevprevword = None
-            prevtag = prevprevtag = None
             #word = word.lower() # Lowercase at the beginning of sentence
         elif index == 1:
             prevword = tokens[index-1] # Note: no lowercase
             prevprevword = None
-            prevtag = history[index-1]
-            prevprevtag = None
         else:
             prevword = tokens[index-1]
             prevprevword = tokens[index-2]
-            prevtag = history[index-1]
-            prevprevtag = history[index-2]
 
         if re.match('[0-9]+([\.,][0-9]*)?|[0-9]*[\.,][0-9]+$', word):
             # Included "," as decimal point
@@ -74,8 +373,6 @@ class ClassifierBasedGermanTagger(ClassifierBasedTagger):
             shape = 'other'
 
         features = {
-            'prevtag': prevtag,
-            'prevprevtag': prevprevtag,
             'word': word,
             'word.lower': word.lower(),
             'suffix3': word.lower()[-3:],
@@ -84,9 +381,57 @@ class ClassifierBasedGermanTagger(ClassifierBasedTagger):
             'preffix1': word[:1], # included
             'prevprevword': prevprevword,
             'prevword': prevword,
-            'prevtag+word': '%s+%s' % (prevtag, word),
-            'prevprevtag+word': '%s+%s' % (prevprevtag, word),
             'prevword+word': '%s+%s' % (prevword, word),
             'shape': shape
             }
-        return features
\ No newline at end of file
+        return features
+
+    @staticmethod
+    def _history_features(word, prevtag, prevprevtag):
+        """Computes the features of a token which depend on the tags
+        chosen for the previous tokens.
+        @param word: The token to tag.
+        @param prevtag: The tag of the previous token, or None.
+        @param prevprevtag: The tag of the token before that, or None.
+        """
+
+        return {
+            'prevtag': prevtag,
+            'prevprevtag': prevprevtag,
+            'prevtag+word': '%s+%s' % (prevtag, word),
+            'prevprevtag+word': '%s+%s' % (prevprevtag, word),
+            }
+
+def benchmark_beam(tagger, tagged_sents, beam_widths=(1, 4, 8), prune=0.001):
+    """Measures the throughput and accuracy of beam decoding with a
+    trained tagger, against greedy tagging with C{tag()}.
+    @param tagger: A trained ClassifierBasedGermanTagger.
+    @param tagged_sents: Gold standard tagged sentences.
+    @param beam_widths: The beam widths to measure.
+    @param prune: The pruning threshold passed to C{tag_nbest()}.
+    @return: C{(beam width, tokens per second, accuracy of the best
+        sequence)} triples, the first one for greedy tagging with a beam
+        width of C{None}.
+    @rtype: C{list} of C{tuple}
+    """
+
+    sentences = [[word for (word, tag) in sent] for sent in tagged_sents]
+    gold = [tag for sent in tagged_sents for (word, tag) in sent]
+    num_tokens = len(gold)
+
+    def measure(tag_sentence):
+        start = time.perf_counter()
+        tags = [tag for sentence in sentences
+                for (word, tag) in tag_sentence(sentence)]
+        elapsed = time.perf_counter() - start
+        correct = sum(1 for (tag, gold_tag) in zip(tags, gold)
+                      if tag == gold_tag)
+        return (num_tokens / elapsed if elapsed else float('inf'),
+                correct / num_tokens if num_tokens else 0.0)
+
+    results = [(None,) + measure(tagger.tag)]
+    for beam_width in beam_widths:
+        results.append((beam_width,) + measure(
+            lambda sentence: tagger.tag_nbest(sentence, beam_width, 1,
+                                              prune)[0][0]))
+    return results
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark.py
+
+Benchmark suite for C{NegraCorpusReader} and C{TigerXMLCorpusReader}.
+
+Synthetic corpora are generated at a base scale and with one
+parameter varied at a time (sentence count, sentence length, tree
+depth, secondary edge density, vocabulary size). For every corpus and
+both readers, each accessor is run over the whole corpus, reporting
+the throughput in sentences per second and the peak memory allocated
+while iterating.
+
+Usage::
+
+    python -m NegraCorpusReader.Benchmark [DIRECTORY] [--quick]
+'''
+
+from .NegraCorpusReader    import NegraCorpusReader
+from .TigerXMLCorpusReader import TigerXMLCorpusReader
+from .SyntheticTreebank    import write_synthetic_corpus
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Accessors to benchmark, with their keyword arguments
+ACCESSORS = (('sents',              {}),
+             ('tagged_sents',       {}),
+             ('parsed_sents',       {}),
+             ('parsed_sents_morph', {'secedge_copy': True}),
+             ('parsed_sents_morph', {'secedge_copy': False}))
+
+# Corpus parameters at the base scale
+BASE_SCALE = {'num_sents':       2000,
+              'sent_length':     15,
+              'depth':           4,
+              'secedge_density': 0.02,
+              'vocab_size':      5000}
+
+# Values each parameter is varied over, the others staying at the base
+VARIATIONS = {'num_sents':       (500, 10000),
+              'sent_length':     (5, 40),
+              'depth':           (2, 8),
+              'secedge_density': (0.0, 0.1),
+              'vocab_size':      (100, 50000)}
+
+def measure(reader, accessor, **kwargs):
+    '''
+    Iterates once over an accessor of a reader to time it, and once
+    more to trace its peak memory allocation.
+
+    Arguments:
+    - `reader`: the corpus reader
+    - `accessor`: the name of the data access method
+    - `kwargs`: the keyword arguments of the data access method
+
+    @return: The number of sentences, the sentences per second and the
+             peak memory allocation in bytes.
+    @rtype: C{tuple} of (C{int}, C{float}, C{int})
+    '''
+    start = time.perf_counter()
+    count = 0
+    for sentence in getattr(reader, accessor)(**kwargs):
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        for sentence in getattr(reader, accessor)(**kwargs):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return count, count / elapsed if elapsed else float('inf'), peak
+
+def scales(base=BASE_SCALE, variations=VARIATIONS):
+    '''
+    Yields the base scale and every single-parameter variation of it,
+    as C{(description, parameters)} pairs.
+    '''
+    yield 'base', dict(base)
+    for name in sorted(variations):
+        for value in variations[name]:
+            parameters = dict(base)
+            parameters[name] = value
+            yield '%s=%s' % (name, value), parameters
+
+def run_benchmarks(directory, corpus_scales=None, accessors=ACCESSORS,
+                   output=sys.stdout):
+    '''
+    Generates the synthetic corpora in C{directory} and benchmarks
+    both readers on them, printing one line per measurement.
+
+    Arguments:
+    - `directory`: where to write the synthetic corpora
+    - `corpus_scales`: C{(description, parameters)} pairs; by default
+      those of L{scales}
+    - `accessors`: C{(accessor, kwargs)} pairs to benchmark
+    - `output`: the stream to print the results to, or C{None}
+
+    @return: The results as C{(scale, reader, accessor, kwargs,
+             sentences, sentences per second, peak bytes)} tuples.
+    @rtype: C{list} of C{tuple}
+    '''
+    if corpus_scales is None:
+        corpus_scales = scales()
+    if output is not None:
+        output.write('%-24s %-22s %-40s %9s %12s\n' %
+                     ('scale', 'reader', 'accessor', 'sents/s', 'peak KiB'))
+    results = []
+    for number, (description, parameters) in enumerate(corpus_scales):
+        negra_fileid, tiger_fileid = write_synthetic_corpus(
+            directory, 'synthetic%d' % number, **parameters)
+        readers = (NegraCorpusReader(directory, [negra_fileid],
+                                     encoding='utf-8'),
+                   TigerXMLCorpusReader(directory, [tiger_fileid]))
+        for reader in readers:
+            for accessor, kwargs in accessors:
+                count, rate, peak = measure(reader, accessor, **kwargs)
+                results.append((description, type(reader).__name__,
+                                accessor, kwargs, count, rate, peak))
+                if output is not None:
+                    name = accessor + ''.join('(%s=%s)' % item
+                                              for item in kwargs.items())
+                    output.write('%-24s %-22s %-40s %9.0f %12.0f\n' %
+                                 (description, type(reader).__name__, name,
+                                  rate, peak / 1024.0))
+                    output.flush()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('directory', nargs='?',
+                        help='where to write the synthetic corpora')
+    parser.add_argument('--quick', action='store_true',
+                        help='only benchmark the base scale')
+    args = parser.parse_args()
+    directory = args.directory or tempfile.mkdtemp()
+    corpus_scales = list(scales())[:1] if args.quick else None
+    run_benchmarks(directory, corpus_scales)
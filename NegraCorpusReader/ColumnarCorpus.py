@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+ColumnarCorpus.py
+
+Columnar export of NEGRA and TIGER XML corpora for fast bulk loading.
+
+A corpus read by a C{NegraCorpusReader} or a C{TigerXMLCorpusReader}
+is streamed, one raw sentence block at a time, into two tables: one
+row per token and one row per nonterminal node. Rows carry the
+running number of their sentence, the corpus file it comes from and
+its id in that file (the number on the NEGRA C{#BOS} line or the id
+of the TIGER C{<s>} element), so they can be joined back to the
+corpus. String columns are
+dictionary-encoded against a single string table shared by both
+tables, and everything is stored as plain NumPy arrays in an
+uncompressed C{.npz} archive, so that loading the whole corpus is a
+handful of bulk array reads.
+'''
+
+from array import array
+import numpy
+
+# Columns of the token table
+TOKEN_COLUMNS       = ('sentence', 'fileid', 'sentence_id', 'position', 'word',
+                       'lemma', 'pos', 'morph', 'edge', 'parent')
+# Columns of the nonterminal table
+NONTERMINAL_COLUMNS = ('sentence', 'fileid', 'sentence_id', 'node', 'cat',
+                       'edge', 'parent')
+# Columns holding codes into the string table
+STRING_COLUMNS      = ('fileid', 'sentence_id', 'word', 'lemma', 'pos',
+                       'morph', 'edge', 'cat')
+
+class ColumnarTable(object):
+    '''
+    A table loaded by L{load_columnar}. Indexing the table by column
+    name returns the column as a NumPy array; string columns are
+    returned as integer codes into the table's C{strings} array and
+    can be decoded with L{decode}.
+    '''
+
+    def __init__(self, columns, strings):
+        self.columns = columns
+        self.strings = strings
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns['sentence'])
+
+    def decode(self, name):
+        '''
+        Returns the string column C{name} as an array of strings.
+        '''
+        return self.strings[self.columns[name]]
+
+def _node_number(value):
+    '''Converts a NEGRA node reference such as C{#500} or C{500} to an int.'''
+    value = value.lstrip('#')
+    return int(value) if value.isdigit() else -1
+
+def export_columnar(reader, path, fileids=None):
+    '''
+    Streams the corpus read by C{reader} into a columnar archive at
+    C{path}. No parse trees are built; the rows are taken directly
+    from the raw sentence blocks.
+
+    Arguments:
+    - `reader`: a C{NegraCorpusReader} or C{TigerXMLCorpusReader}
+    - `path`: the file name of the C{.npz} archive to write
+    - `fileids`: the corpus files to export; defaults to all of them
+
+    @return: The number of sentences exported.
+    @rtype: C{int}
+    '''
+    string_codes = {}
+    def encode(value):
+        code = string_codes.get(value)
+        if code is None:
+            code = string_codes[value] = len(string_codes)
+        return code
+
+    if fileids is None:
+        fileids = reader.fileids()
+    elif isinstance(fileids, str):
+        fileids = [fileids]
+    blocks = ((fileid, block) for fileid in fileids
+              for block in reader._sentence_blocks([fileid]))
+
+    tokens       = dict((name, array('i')) for name in TOKEN_COLUMNS)
+    nonterminals = dict((name, array('i')) for name in NONTERMINAL_COLUMNS)
+    num_sents    = 0
+    for sentence, (fileid, block) in enumerate(blocks):
+        terminal_rows, nonterminal_rows = reader._get_rows(block)
+        fileid      = encode(fileid)
+        sentence_id = encode(reader._get_metadata(block)[0])
+        for position, row in enumerate(terminal_rows):
+            word, lemma, pos, morph, edge, parent = row[:6]
+            tokens['sentence'].append(sentence)
+            tokens['fileid'].append(fileid)
+            tokens['sentence_id'].append(sentence_id)
+            tokens['position'].append(position)
+            tokens['word'].append(encode(word))
+            tokens['lemma'].append(encode(lemma))
+            tokens['pos'].append(encode(pos))
+            tokens['morph'].append(encode(morph))
+            tokens['edge'].append(encode(edge))
+            tokens['parent'].append(_node_number(parent))
+        for row in nonterminal_rows:
+            nonterminals['sentence'].append(sentence)
+            nonterminals['fileid'].append(fileid)
+            nonterminals['sentence_id'].append(sentence_id)
+            nonterminals['node'].append(_node_number(row[0]))
+            nonterminals['cat'].append(encode(row[2]))
+            nonterminals['edge'].append(encode(row[4]))
+            nonterminals['parent'].append(_node_number(row[5]))
+        num_sents = sentence + 1
+
+    strings = [None] * len(string_codes)
+    for value, code in string_codes.items():
+        strings[code] = value
+    arrays = {'strings': numpy.array(strings, dtype=str)}
+    for (prefix, table) in (('tokens', tokens),
+                            ('nonterminals', nonterminals)):
+        for name, values in table.items():
+            arrays[prefix + '.' + name] = numpy.frombuffer(values,
+                                                           dtype=numpy.int32)
+    with open(path, 'wb') as output_file:
+        numpy.savez(output_file, **arrays)
+    return num_sents
+
+def load_columnar(path):
+    '''
+    Loads a columnar archive written by L{export_columnar}.
+
+    Arguments:
+    - `path`: the file name of the C{.npz} archive
+
+    @return: The token table and the nonterminal table.
+    @rtype: C{tuple} of (L{ColumnarTable}, L{ColumnarTable})
+    '''
+    with numpy.load(path) as archive:
+        strings      = archive['strings']
+        tokens       = dict((name, archive['tokens.' + name])
+                            for name in TOKEN_COLUMNS)
+        nonterminals = dict((name, archive['nonterminals.' + name])
+                            for name in NONTERMINAL_COLUMNS)
+    return (ColumnarTable(tokens, strings),
+            ColumnarTable(nonterminals, strings))
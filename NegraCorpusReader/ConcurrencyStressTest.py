@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+ConcurrencyStressTest.py
+
+Stress test for sharing C{NegraCorpusReader} and
+C{TigerXMLCorpusReader} instances between threads.
+
+A synthetic corpus is read sequentially by a fresh reader to get the
+expected sentences. Then many threads read from one shared reader at
+once, half of them iterating over the whole corpus and half of them
+indexing random sentences, and one thread interleaves nested
+iterations over the same file. Every sentence read has to match the
+sequential pass.
+
+Usage::
+
+    python -m NegraCorpusReader.ConcurrencyStressTest [DIRECTORY] [options]
+'''
+
+from .NegraCorpusReader    import NegraCorpusReader
+from .TigerXMLCorpusReader import TigerXMLCorpusReader
+from .SyntheticTreebank    import write_synthetic_corpus
+from concurrent.futures    import ThreadPoolExecutor
+import argparse
+import copy
+import random
+import sys
+import tempfile
+
+def _sequential_access(reader, accessor, expected, seed):
+    return [(index, str(sentence)) for (index, sentence)
+            in enumerate(getattr(reader, accessor)())]
+
+def _random_access(reader, accessor, expected, seed, num_reads=200):
+    rand      = random.Random(seed)
+    sentences = getattr(reader, accessor)()
+    indices   = [rand.randrange(len(expected)) for i in range(num_reads)]
+    return [(index, str(sentences[index])) for index in indices]
+
+def _nested_access(reader, accessor, expected, seed):
+    # while one iteration is in progress, others over the same file
+    # index into it and run to its end in the same thread
+    results = []
+    for index, sentence in enumerate(getattr(reader, accessor)()):
+        results.append((index, str(sentence)))
+        if index % 97 == 3:
+            inner = getattr(reader, accessor)()
+            results.append((index, str(inner[index])))
+            results.extend((i, str(inner_sentence)) for (i, inner_sentence)
+                           in enumerate(inner) if i % 97 == seed % 97)
+    return results
+
+def stress_test(reader, accessor='parsed_sents', threads=16, tasks=64,
+                seed=0):
+    '''
+    Compares concurrent reads from a reader with a sequential pass of
+    a fresh reader over the same files.
+
+    Arguments:
+    - `reader`: the corpus reader to share between threads
+    - `accessor`: the name of the data access method to call
+    - `threads`: the number of threads
+    - `tasks`: the number of reading tasks, alternately iterating over
+      the corpus and indexing random sentences; the first task also
+      nests iterations
+    - `seed`: the random seed for the indices read
+
+    @return: The number of sentences read and the number of those
+             which differed from the sequential pass.
+    @rtype: C{tuple} of (C{int}, C{int})
+    '''
+    # a copy of the reader starts out without any shared views
+    fresh    = copy.copy(reader)
+    expected = [str(sentence) for sentence in getattr(fresh, accessor)()]
+
+    def task(number):
+        if number == 0:
+            access = _nested_access
+        elif number % 2:
+            access = _sequential_access
+        else:
+            access = _random_access
+        return access(reader, accessor, expected, seed + number)
+
+    num_reads = num_errors = 0
+    with ThreadPoolExecutor(threads) as executor:
+        for results in executor.map(task, range(tasks)):
+            num_reads  += len(results)
+            num_errors += sum(1 for (index, sentence) in results
+                              if sentence != expected[index])
+    return num_reads, num_errors
+
+def run_stress_tests(directory, threads=16, tasks=64, num_sents=1000,
+                     output=sys.stdout):
+    '''
+    Generates a synthetic corpus in C{directory} and stress tests both
+    readers on it, printing one line per reader and accessor.
+
+    @return: Whether all concurrent reads matched the sequential pass.
+    @rtype: C{bool}
+    '''
+    negra_fileid, tiger_fileid = write_synthetic_corpus(
+        directory, 'stress', num_sents=num_sents, secedge_density=0.02)
+    readers = (NegraCorpusReader(directory, [negra_fileid],
+                                 encoding='utf-8'),
+               TigerXMLCorpusReader(directory, [tiger_fileid]))
+    passed = True
+    for reader in readers:
+        for accessor in ('sents', 'tagged_sents', 'parsed_sents'):
+            num_reads, num_errors = stress_test(reader, accessor, threads,
+                                                tasks)
+            passed = passed and not num_errors
+            if output is not None:
+                output.write('%-22s %-14s %8d reads %6d mismatches\n' %
+                             (type(reader).__name__, accessor, num_reads,
+                              num_errors))
+                output.flush()
+    return passed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('directory', nargs='?',
+                        help='where to write the synthetic corpus')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--tasks', type=int, default=64)
+    parser.add_argument('--sents', type=int, default=1000)
+    args = parser.parse_args()
+    directory = args.directory or tempfile.mkdtemp()
+    sys.exit(0 if run_stress_tests(directory, args.threads, args.tasks,
+                                   args.sents) else 1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+ConcurrentCorpusView.py
+
+Corpus views which can be shared between threads.
+
+The NLTK's C{StreamBackedCorpusView} keeps its open file stream and
+its cache of the most recently read block on the view itself, so two
+threads reading from the same view seek and read the same stream
+under each other's feet. The views defined here keep a pool of
+streams and the block cache per thread; an iteration takes a stream
+from its thread's pool and returns it when done, so nested iterations
+in one thread never share a stream, and a new stream is only opened
+when all of the thread's streams are in use. The mapping from token indices to file
+positions, which is the expensive part to rebuild, stays shared: it
+only ever grows, so it is read without locking and a lock is only
+taken to append to it.
+'''
+
+import bisect
+import threading
+
+from nltk.corpus.reader.util    import (StreamBackedCorpusView,
+                                        ConcatenatedCorpusView)
+from nltk.corpus.reader.xmldocs import XMLCorpusView
+from .Instrumentation           import instrumented
+
+class _ConcurrentViewMixin(object):
+    '''
+    Mixin for subclasses of C{StreamBackedCorpusView} which gives each
+    iteration a file stream of its own from a thread-local pool, makes
+    the block cache thread-local and guards the growth of the shared
+    block index.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self._local      = threading.local()
+        self._index_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _get_local(name, default):
+        return property(lambda self: getattr(self._local, name, default),
+                        lambda self, value: setattr(self._local, name, value))
+
+    _stream           = _get_local('stream', None)
+    _free_streams     = _get_local('free_streams', None)
+    _cache            = _get_local('cache', (-1, -1, None))
+    _current_toknum   = _get_local('current_toknum', None)
+    _current_blocknum = _get_local('current_blocknum', None)
+    del _get_local
+
+    def iterate_from(self, start_tok):
+        # Serve what we can from this thread's block cache.
+        cache = self._cache
+        if cache[0] <= start_tok < cache[1]:
+            for tok in cache[2][start_tok - cache[0]:]:
+                yield tok
+                start_tok += 1
+
+        # Find the closest known block. File positions are appended
+        # before token numbers, so every block counted here has both.
+        num_blocks = len(self._toknum)
+        if start_tok < self._toknum[num_blocks - 1]:
+            block_index = bisect.bisect_right(self._toknum, start_tok,
+                                              0, num_blocks) - 1
+        else:
+            block_index = num_blocks - 1
+        toknum  = self._toknum[block_index]
+        filepos = self._filepos[block_index]
+
+        # Take a stream of our own: other iterations over this view,
+        # even in the same thread, must not see it moved.
+        free_streams = self._free_streams
+        if free_streams is None:
+            free_streams = self._free_streams = []
+        if free_streams:
+            stream = free_streams.pop()
+        else:
+            previous = self._stream
+            self._open()
+            stream, self._stream = self._stream, previous
+        try:
+            yield from self._iterate_stream(stream, start_tok, toknum,
+                                            filepos, block_index)
+        finally:
+            free_streams.append(stream)
+
+    def _iterate_stream(self, stream, start_tok, toknum, filepos,
+                        block_index):
+        if self._eofpos == 0:
+            self._len = 0
+
+        while filepos < self._eofpos:
+            stream.seek(filepos)
+            self._current_toknum   = toknum
+            self._current_blocknum = block_index
+            tokens      = _read_block(self, stream)
+            num_toks    = len(tokens)
+            new_filepos = stream.tell()
+            assert new_filepos > filepos, (
+                'block reader %s() should consume at least 1 byte' %
+                self.read_block.__name__)
+            self._cache = (toknum, toknum + num_toks, list(tokens))
+
+            # Extend the shared block index if this block is new.
+            if num_toks > 0:
+                block_index += 1
+                if block_index == len(self._toknum):
+                    with self._index_lock:
+                        if block_index == len(self._toknum):
+                            self._filepos.append(new_filepos)
+                            self._toknum.append(toknum + num_toks)
+            if new_filepos == self._eofpos:
+                self._len = toknum + num_toks
+
+            for tok in tokens[max(0, start_tok - toknum):]:
+                yield tok
+            if new_filepos == self._eofpos:
+                break
+            toknum += num_toks
+            filepos = new_filepos
+
+    def close(self):
+        # Closes the streams of the calling thread's pool which are not
+        # in use; the others go back to the pool when their iterations
+        # finish.
+        for stream in self._free_streams or ():
+            stream.close()
+        self._free_streams = None
+        super().close()
+
+@instrumented('block_reading')
+def _read_block(view, stream):
+    return view.read_block(stream)
+
+class ConcurrentStreamBackedCorpusView(_ConcurrentViewMixin,
+                                       StreamBackedCorpusView):
+    '''
+    A C{StreamBackedCorpusView} which may be read by several threads
+    at once.
+    '''
+
+class ConcurrentXMLCorpusView(_ConcurrentViewMixin, XMLCorpusView):
+    '''
+    An C{XMLCorpusView} which may be read by several threads at once.
+    '''
+
+class ConcurrentConcatenatedCorpusView(ConcatenatedCorpusView):
+    '''
+    A C{ConcatenatedCorpusView} which may be read by several threads
+    at once. Its pieces should be concurrent views themselves.
+    '''
+
+    def __init__(self, corpus_views):
+        super().__init__(corpus_views)
+        self._offsets_lock = threading.Lock()
+
+    def iterate_from(self, start_tok):
+        offsets  = self._offsets
+        piecenum = bisect.bisect_right(offsets, start_tok) - 1
+        while piecenum < len(self._pieces):
+            offset = offsets[piecenum]
+            piece  = self._pieces[piecenum]
+            yield from piece.iterate_from(max(0, start_tok - offset))
+            if piecenum + 1 == len(offsets):
+                with self._offsets_lock:
+                    if piecenum + 1 == len(offsets):
+                        offsets.append(offsets[-1] + len(piece))
+            piecenum += 1
+
+def concurrent_concat(views):
+    '''
+    Concatenates concurrent corpus views, like the NLTK's C{concat}.
+    '''
+    if len(views) == 1:
+        return views[0]
+    return ConcurrentConcatenatedCorpusView(views)
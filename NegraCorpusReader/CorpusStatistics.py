@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+CorpusStatistics.py
+
+Corpus statistics computed in one streaming pass over the raw
+sentence annotation.
+
+The statistics are gathered from the NEGRA export rows of each
+sentence (see the C{_get_rows()} transforms of the readers), so no
+tuples or trees are built per token. A pass can be split between
+worker processes, each counting a byte range of the corpus files;
+the partial L{CorpusStatistics} are then merged.
+'''
+
+from nltk.probability import FreqDist
+import multiprocessing
+import os
+
+class CorpusStatistics(object):
+    '''
+    Mergeable frequency tables over a corpus. Each requested
+    aggregate is a C{FreqDist}:
+
+      - C{pos}: part of speech tags of the tokens
+      - C{morph}: morphological tags of the tokens
+      - C{lemma}: lemmata of the tokens
+      - C{edge}: edge labels of tokens and nonterminal nodes
+      - C{length}: sentence lengths in tokens
+      - C{depth}: sentence tree depths, measured like C{Tree.height()}
+        on the trees returned by C{parsed_sents()}
+
+    Two statistics over disjoint parts of a corpus are merged with
+    C{+} or L{update}.
+    '''
+
+    AGGREGATES = ('pos', 'morph', 'lemma', 'edge', 'length', 'depth')
+
+    def __init__(self, aggregates=None):
+        '''
+        Creates empty statistics.
+
+        Arguments:
+        - `aggregates`: the names of the aggregates to collect; all of
+          C{AGGREGATES} by default
+        '''
+        if aggregates is None:
+            aggregates = self.AGGREGATES
+        for name in aggregates:
+            if name not in self.AGGREGATES:
+                raise ValueError('Aggregate %r is not supported.' % name)
+        self.aggregates = tuple(aggregates)
+        self.sentences  = 0
+        self.tokens     = 0
+        self.counts     = dict((name, FreqDist()) for name in self.aggregates)
+
+    def __getitem__(self, name):
+        return self.counts[name]
+
+    def __add__(self, other):
+        result = CorpusStatistics(self.aggregates)
+        result.update(self)
+        result.update(other)
+        return result
+
+    def update(self, other):
+        '''
+        Adds the counts of another L{CorpusStatistics} to this one.
+        '''
+        if other.aggregates != self.aggregates:
+            raise ValueError('Cannot merge statistics of different '
+                             'aggregates.')
+        self.sentences += other.sentences
+        self.tokens    += other.tokens
+        for name in self.aggregates:
+            self.counts[name].update(other.counts[name])
+
+    def add_sentence(self, terminals, nonterminals):
+        '''
+        Counts a sentence, given as NEGRA export rows.
+
+        Arguments:
+        - `terminals`: the terminal rows of the sentence
+        - `nonterminals`: the nonterminal rows of the sentence
+        '''
+        self.sentences += 1
+        self.tokens    += len(terminals)
+        counts = self.counts
+        if 'pos' in counts:
+            counts['pos'].update(row[2] for row in terminals)
+        if 'morph' in counts:
+            counts['morph'].update(row[3] for row in terminals)
+        if 'lemma' in counts:
+            counts['lemma'].update(row[1] for row in terminals)
+        if 'edge' in counts:
+            counts['edge'].update(row[4] for row in terminals)
+            counts['edge'].update(row[4] for row in nonterminals)
+        if 'length' in counts:
+            counts['length'][len(terminals)] += 1
+        if 'depth' in counts and terminals:
+            depth = _tree_depth(terminals, nonterminals)
+            if depth is not None:
+                counts['depth'][depth] += 1
+
+def _tree_depth(terminals, nonterminals):
+    '''
+    Computes the height of the sentence tree from its NEGRA export
+    rows, or returns C{None} if the sentence has no root node. Like
+    the readers, nodes attached to C{0} other than the root are
+    treated as children of the root.
+    '''
+    parents = dict((row[0][1:], row[5]) for row in nonterminals)
+    roots   = [row[0][1:] for row in nonterminals if row[5] == '0']
+    if not roots:
+        return None
+    top = roots[-1]
+    def depth(node):
+        count = 0
+        if node == '0':
+            node = top
+        while node in parents and count <= len(parents):
+            count += 1
+            if node == top:
+                break
+            node = parents[node]
+            if node == '0':
+                node = top
+        return count
+    # a preterminal and its leaf add two levels below the nonterminals
+    return 2 + max(depth(row[5]) for row in terminals)
+
+def _count_blocks(reader, blocks, aggregates):
+    statistics = CorpusStatistics(aggregates)
+    for block in blocks:
+        statistics.add_sentence(*reader._get_rows(block))
+    return statistics
+
+_worker_reader = None
+
+def _init_worker(reader):
+    global _worker_reader
+    _worker_reader = reader
+
+def _count_shard(shard):
+    fileid, start, end, aggregates, where = shard
+    return _count_blocks(_worker_reader,
+                         _worker_reader._sentence_blocks_in_range(
+                             fileid, start, end, where),
+                         aggregates)
+
+def corpus_statistics(reader, fileids=None, aggregates=None, where=None,
+                      processes=1, shards_per_process=4):
+    '''
+    Computes L{CorpusStatistics} for a C{NegraCorpusReader} or
+    C{TigerXMLCorpusReader} in a single pass over the raw corpus.
+
+    Arguments:
+    - `reader`: the corpus reader
+    - `fileids`: the corpus files to count; defaults to all of them
+    - `aggregates`: the names of the aggregates to collect
+    - `where`: an optional C{SentenceFilter}
+    - `processes`: the number of worker processes; with more than one,
+      each corpus file is split into byte ranges which are counted in
+      parallel and merged
+    - `shards_per_process`: the number of byte ranges per process,
+      which evens out the load between the workers
+
+    @rtype: L{CorpusStatistics}
+    '''
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        return _count_blocks(reader, reader._sentence_blocks(fileids, where),
+                             aggregates)
+
+    if fileids is None:
+        fileids = reader.fileids()
+    elif isinstance(fileids, str):
+        fileids = [fileids]
+    shards = []
+    for fileid in fileids:
+        size   = reader.abspath(fileid).file_size()
+        bounds = [size * i // (processes * shards_per_process)
+                  for i in range(processes * shards_per_process + 1)]
+        shards.extend((fileid, start, end, aggregates, where)
+                      for (start, end) in zip(bounds, bounds[1:])
+                      if start < end)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    statistics = CorpusStatistics(aggregates)
+    with context.Pool(processes, _init_worker, (reader,)) as pool:
+        for partial in pool.imap_unordered(_count_shard, shards):
+            statistics.update(partial)
+    return statistics
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+CorpusWriter.py
+
+Write sentences in the NEGRA export format and in TIGER XML.
+
+Sentences are given as pairs of terminal and nonterminal NEGRA export
+rows, as returned by the C{_get_rows()} transforms of
+C{NegraCorpusReader} and C{TigerXMLCorpusReader}: tuples with one
+string per entry in C{NegraCorpusReader.COLUMN_TYPES}, where the
+secondary edge's parent is kept in the C{comment} column, and further
+secondary edges follow as more secedge and parent pairs. Editor
+comments on sentences and rows can be passed alongside; they become
+C{%%} comments in the NEGRA export format and C{comment} attributes
+in TIGER XML.
+'''
+
+from xml.sax.saxutils import quoteattr
+
+# Header line of NEGRA export files written by this module
+NEGRA_HEADER = '%% word\tlemma\ttag\tmorph\tedge\tparent\tsecedge\tcomment\n'
+
+# End of TIGER XML files written by this module
+TIGER_FOOTER = '</body>\n</corpus>\n'
+
+def negra_sentence(number, terminals, nonterminals, comment='',
+                   line_comments=None):
+    '''
+    Formats a sentence as a NEGRA export block.
+
+    Arguments:
+    - `number`: the sentence number used on the C{#BOS}/C{#EOS} lines
+    - `terminals`: the terminal rows
+    - `nonterminals`: the nonterminal rows
+    - `comment`: an optional comment on the sentence
+    - `line_comments`: optional comments on the rows, one per row
+
+    @rtype: C{str}
+    '''
+    rows  = terminals + nonterminals
+    lines = ['#BOS %s%s\n' % (number, _negra_comment(comment))]
+    for row, line_comment in zip(rows, line_comments or [''] * len(rows)):
+        # trailing empty columns are left out, and since columns are
+        # separated by whitespace, other empty columns become '--'
+        row = list(row)
+        while row and not row[-1]:
+            row.pop()
+        lines.append('\t'.join(value or '--' for value in row) +
+                     _negra_comment(line_comment) + '\n')
+    lines.append('#EOS %s\n' % number)
+    return ''.join(lines)
+
+def _negra_comment(comment):
+    # a comment runs to the end of its line
+    comment = ' '.join(comment.split())
+    return '\t%%%% %s' % comment if comment else ''
+
+def tiger_header(corpus_id='corpus'):
+    '''
+    Formats the start of a TIGER XML corpus, up to its C{<body>}.
+
+    @rtype: C{str}
+    '''
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<corpus id=%s>\n<body>\n' % quoteattr(corpus_id))
+
+def tiger_sentence(sentence_id, terminals, nonterminals, comment='',
+                   line_comments=None):
+    '''
+    Formats a sentence as a TIGER XML C{<s>} element. Nodes attached
+    to C{0} become children of a virtual root node.
+
+    Arguments:
+    - `sentence_id`: the id of the sentence element
+    - `terminals`: the terminal rows
+    - `nonterminals`: the nonterminal rows
+    - `comment`: an optional comment on the sentence
+    - `line_comments`: optional comments on the rows, one per row
+
+    @rtype: C{str}
+    '''
+    def node_id(number):
+        return quoteattr('%s_%s' % (sentence_id, number.lstrip('#')))
+    vroot    = '%s_VROOT' % sentence_id
+    children = {}
+    for idx, row in enumerate(terminals):
+        children.setdefault(row[5], []).append((row[4], str(idx + 1)))
+    for row in nonterminals:
+        children.setdefault(row[5], []).append((row[4], row[0]))
+
+    def secedges(row):
+        return ''.join('<secedge label=%s idref=%s/>' % (quoteattr(label),
+                                                        node_id(parent))
+                       for (label, parent) in zip(row[6::2], row[7::2])
+                       if label)
+
+    if line_comments is None:
+        line_comments = [''] * (len(terminals) + len(nonterminals))
+    def comment_attribute(text):
+        return ' comment=%s' % quoteattr(text) if text else ''
+
+    lines = ['<s id=%s%s>\n' % (quoteattr(sentence_id),
+                                comment_attribute(comment)),
+             '<graph root=%s>\n' % quoteattr(vroot),
+             '<terminals>\n']
+    for idx, row in enumerate(terminals):
+        attributes = ('<t id=%s word=%s lemma=%s pos=%s morph=%s%s' %
+                      (node_id(str(idx + 1)), quoteattr(row[0]),
+                       quoteattr(row[1]), quoteattr(row[2]),
+                       quoteattr(row[3]),
+                       comment_attribute(line_comments[idx])))
+        if secedges(row):
+            lines.append('%s>%s</t>\n' % (attributes, secedges(row)))
+        else:
+            lines.append('%s/>\n' % attributes)
+    lines.append('</terminals>\n<nonterminals>\n')
+
+    def edges(number):
+        return ['<edge label=%s idref=%s/>\n' % (quoteattr(label),
+                                                node_id(child))
+                for (label, child) in children.get(number, [])]
+    for idx, row in enumerate(nonterminals, len(terminals)):
+        lines.append('<nt id=%s cat=%s%s>\n' %
+                     (node_id(row[0]), quoteattr(row[2]),
+                      comment_attribute(line_comments[idx])))
+        lines.extend(edges(row[0].lstrip('#')))
+        if secedges(row):
+            lines.append(secedges(row) + '\n')
+        lines.append('</nt>\n')
+    lines.append('<nt id=%s cat="VROOT">\n' % quoteattr(vroot))
+    lines.extend(edges('0'))
+    lines.append('</nt>\n')
+    lines.append('</nonterminals>\n</graph>\n</s>\n')
+    return ''.join(lines)
+
+def write_negra(sentences, stream):
+    '''
+    Writes sentences to a stream in the NEGRA export format.
+
+    Arguments:
+    - `sentences`: an iterable of C{(terminals, nonterminals)} pairs
+    - `stream`: a text stream
+
+    @return: The number of sentences written.
+    @rtype: C{int}
+    '''
+    stream.write(NEGRA_HEADER)
+    number = 0
+    for number, (terminals, nonterminals) in enumerate(sentences, 1):
+        stream.write(negra_sentence(number, terminals, nonterminals))
+    return number
+
+def write_tiger_xml(sentences, stream, corpus_id='corpus'):
+    '''
+    Writes sentences to a stream as a TIGER XML corpus.
+
+    Arguments:
+    - `sentences`: an iterable of C{(terminals, nonterminals)} pairs
+    - `stream`: a text stream, which should encode as UTF-8
+    - `corpus_id`: the id of the corpus element
+
+    @return: The number of sentences written.
+    @rtype: C{int}
+    '''
+    stream.write(tiger_header(corpus_id))
+    number = 0
+    for number, (terminals, nonterminals) in enumerate(sentences, 1):
+        stream.write(tiger_sentence('s%d' % number, terminals, nonterminals))
+    stream.write(TIGER_FOOTER)
+    return number
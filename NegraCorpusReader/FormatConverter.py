@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+FormatConverter.py
+
+Streaming conversion between the NEGRA export format and TIGER XML.
+
+Sentences are read one at a time from the raw corpus files with the
+parsing logic of C{NegraCorpusReader} and C{TigerXMLCorpusReader},
+flattened into NEGRA export rows by their C{_get_rows()} transforms
+and written out with L{CorpusWriter}, so memory use does not grow
+with the size of the corpus. Lemmata, morphology, secondary edges,
+sentence ids and editor comments are carried over. With several
+worker processes, the corpus files are split into byte ranges which
+are converted in parallel and written out in order. The extra fields
+of NEGRA #BOS lines (editor, date, origin) have no TIGER XML
+counterpart and are not carried over.
+
+Usage::
+
+    python -m NegraCorpusReader.FormatConverter INPUT OUTPUT [options]
+'''
+
+from .NegraCorpusReader    import NegraCorpusReader
+from .TigerXMLCorpusReader import TigerXMLCorpusReader
+from .CorpusWriter         import (NEGRA_HEADER, TIGER_FOOTER, negra_sentence,
+                                   tiger_header, tiger_sentence)
+import argparse
+import collections
+import io
+import multiprocessing
+import os
+import sys
+
+# Formats which can be written, by name
+OUTPUT_FORMATS = ('negra', 'tiger')
+
+# Size of the byte ranges converted by each worker process task
+SHARD_SIZE = 1 << 22
+
+def _sentence_id(sentence_id, output_format):
+    # TIGER sentence ids are the NEGRA sentence numbers prefixed by 's'
+    if output_format == 'negra':
+        if sentence_id[:1] == 's' and sentence_id[1:].isdigit():
+            return sentence_id[1:]
+    elif sentence_id.isdigit():
+        return 's' + sentence_id
+    return sentence_id
+
+def _convert_blocks(reader, blocks, output_format):
+    for block in blocks:
+        terminals, nonterminals = reader._get_rows(block)
+        sentence_id, comment, line_comments = reader._get_metadata(block)
+        sentence_id = _sentence_id(sentence_id, output_format)
+        if output_format == 'negra':
+            yield negra_sentence(sentence_id, terminals, nonterminals,
+                                 comment, line_comments)
+        else:
+            yield tiger_sentence(sentence_id, terminals, nonterminals,
+                                 comment, line_comments)
+
+_worker_reader = None
+
+def _init_worker(reader):
+    global _worker_reader
+    _worker_reader = reader
+
+def _convert_shard(shard):
+    fileid, start, end, output_format, where = shard
+    sentences = list(_convert_blocks(_worker_reader,
+                                     _worker_reader._sentence_blocks_in_range(
+                                         fileid, start, end, where),
+                                     output_format))
+    return len(sentences), ''.join(sentences)
+
+def convert(reader, stream, output_format, fileids=None, where=None,
+            processes=1, corpus_id='corpus', shard_size=SHARD_SIZE):
+    '''
+    Converts the sentences of a C{NegraCorpusReader} or
+    C{TigerXMLCorpusReader} to the NEGRA export format or TIGER XML.
+
+    Arguments:
+    - `reader`: the corpus reader
+    - `stream`: the text stream to write to; it should encode as UTF-8
+      when writing TIGER XML
+    - `output_format`: one of L{OUTPUT_FORMATS}
+    - `fileids`: the corpus files to convert; defaults to all of them
+    - `where`: an optional C{SentenceFilter}
+    - `processes`: the number of worker processes; with more than one,
+      byte ranges of C{shard_size} bytes are converted in parallel,
+      with at most two ranges per process in flight at any time
+    - `corpus_id`: the id of the corpus element when writing TIGER XML
+    - `shard_size`: the size of the byte ranges in parallel mode
+
+    @return: The number of sentences written.
+    @rtype: C{int}
+    '''
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError('Output format %r is not supported.' % output_format)
+    if fileids is None:
+        fileids = reader.fileids()
+    elif isinstance(fileids, str):
+        fileids = [fileids]
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    stream.write(NEGRA_HEADER if output_format == 'negra'
+                 else tiger_header(corpus_id))
+    count = 0
+    if processes <= 1:
+        for fileid in fileids:
+            size   = reader.abspath(fileid).file_size()
+            blocks = reader._sentence_blocks_in_range(fileid, 0, size, where)
+            for sentence in _convert_blocks(reader, blocks, output_format):
+                stream.write(sentence)
+                count += 1
+    else:
+        shards = ((fileid, start, start + shard_size, output_format, where)
+                  for fileid in fileids
+                  for start in range(0, reader.abspath(fileid).file_size(),
+                                     shard_size))
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        with context.Pool(processes, _init_worker, (reader,)) as pool:
+            # a bounded window of pending shards keeps the converted
+            # text waiting to be written from piling up in memory
+            pending = collections.deque()
+            for shard in shards:
+                pending.append(pool.apply_async(_convert_shard, (shard,)))
+                if len(pending) >= 2 * processes:
+                    count += _write_shard(stream, pending.popleft().get())
+            while pending:
+                count += _write_shard(stream, pending.popleft().get())
+    if output_format == 'tiger':
+        stream.write(TIGER_FOOTER)
+    return count
+
+def _write_shard(stream, shard):
+    count, text = shard
+    stream.write(text)
+    return count
+
+def negra_to_tiger_xml(reader, stream, **kwargs):
+    '''
+    Converts the sentences of a C{NegraCorpusReader} to TIGER XML; see
+    L{convert} for the keyword arguments.
+    '''
+    return convert(reader, stream, 'tiger', **kwargs)
+
+def tiger_xml_to_negra(reader, stream, **kwargs):
+    '''
+    Converts the sentences of a C{TigerXMLCorpusReader} to the NEGRA
+    export format; see L{convert} for the keyword arguments.
+    '''
+    return convert(reader, stream, 'negra', **kwargs)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('input',
+                        help='a TIGER XML file (*.xml) or a NEGRA export file')
+    parser.add_argument('output')
+    parser.add_argument('--encoding', default='utf-8',
+                        help='the encoding of a NEGRA input file')
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+    root, fileid = os.path.split(os.path.abspath(args.input))
+    if fileid.lower().endswith('.xml'):
+        reader, output_format = TigerXMLCorpusReader(root, [fileid]), 'negra'
+    else:
+        reader = NegraCorpusReader(root, [fileid], encoding=args.encoding)
+        output_format = 'tiger'
+    with io.open(args.output, 'w', encoding='utf-8') as stream:
+        count = convert(reader, stream, output_format,
+                        processes=args.processes,
+                        corpus_id=os.path.splitext(fileid)[0])
+    sys.stderr.write('%d sentences converted\n' % count)
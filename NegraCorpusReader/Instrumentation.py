@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Instrumentation.py
+
+Opt-in per-stage timers for the corpus readers and the tagger.
+
+The hot paths of the readers and of C{ClassifierBasedGermanTagger}
+are marked as stages:
+
+  - C{block_reading}: reading a raw sentence block from a corpus file
+  - C{column_extraction}: C{NegraCorpusReader._get_column}
+  - C{tree_building}: building a parse tree from a grid or C{<s>}
+    element, including any secondary edge copying
+  - C{secedge_copy}: copying subtrees for secondary edges
+  - C{feature_detection}: the tagger's C{feature_detector}
+  - C{classification}: the tagger's classifier call
+
+Stages may be nested in each other. As long as nobody is listening,
+a stage costs one truth test per call. Timings are collected with
+the L{collect} context manager or delivered to callbacks registered
+with L{add_callback}::
+
+    with collect() as timings:
+        reader.parsed_sents_morph()[:1000]
+    print(timings.report())
+'''
+
+from contextlib import contextmanager
+import functools
+import threading
+import time
+
+# Functions called with (stage, seconds) whenever a stage completes.
+# Hot paths test this list for emptiness before timing anything.
+_listeners = []
+_listeners_lock = threading.Lock()
+
+class StageTimings(object):
+    '''
+    Cumulative call counts and times per stage.
+    '''
+
+    def __init__(self):
+        self.calls   = {}
+        self.seconds = {}
+        self._lock   = threading.Lock()
+
+    def __call__(self, stage, seconds):
+        with self._lock:
+            self.calls[stage]   = self.calls.get(stage, 0) + 1
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def report(self):
+        '''
+        Formats the timings as a table, slowest stage first.
+
+        @rtype: C{str}
+        '''
+        lines = ['%-20s %10s %12s %12s' % ('stage', 'calls', 'seconds',
+                                           'us/call')]
+        for stage in sorted(self.seconds, key=self.seconds.get,
+                            reverse=True):
+            lines.append('%-20s %10d %12.3f %12.1f' %
+                         (stage, self.calls[stage], self.seconds[stage],
+                          1e6 * self.seconds[stage] / self.calls[stage]))
+        return '\n'.join(lines)
+
+def add_callback(callback):
+    '''
+    Registers a function to be called with C{(stage, seconds)} each
+    time an instrumented stage completes, in the thread that ran it.
+    '''
+    with _listeners_lock:
+        _listeners.append(callback)
+
+def remove_callback(callback):
+    '''
+    Unregisters a function registered with L{add_callback}.
+    '''
+    with _listeners_lock:
+        _listeners.remove(callback)
+
+@contextmanager
+def collect():
+    '''
+    Context manager which collects the stage timings of everything
+    run inside it, in any thread, into a L{StageTimings}.
+    '''
+    timings = StageTimings()
+    add_callback(timings)
+    try:
+        yield timings
+    finally:
+        remove_callback(timings)
+
+def record(stage, seconds):
+    '''
+    Reports a completed stage to all listeners.
+    '''
+    for listener in list(_listeners):
+        listener(stage, seconds)
+
+def instrumented(stage):
+    '''
+    Decorator marking a function as an instrumented stage.
+    '''
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _listeners:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
@@ -30,7 +30,13 @@ from nltk.util               import LazyConcatenation
 from nltk.corpus.reader      import ConllCorpusReader
 from nltk.corpus.reader.util import read_regexp_block
 from nltk.corpus.reader.api  import CorpusReader
+from .ConcurrentCorpusView   import ConcurrentStreamBackedCorpusView
+from .ConcurrentCorpusView   import concurrent_concat
+from .CorpusStatistics       import corpus_statistics
+from .Instrumentation        import instrumented
 import itertools
+import re
+import threading
 
 class Atom(object):
     '''
@@ -70,6 +76,16 @@ class Atom(object):
         '''Returns the tree node which is parent to this Atom.'''
         return self._parent
 
+class _Grid(list):
+    '''
+    The grid of a sentence: a list of its lines, each split into
+    columns. The #BOS line of the sentence is kept in C{bos_line}, and
+    the C{%%} editor comments removed from the ends of the lines in
+    C{line_comments}.
+    '''
+    bos_line = ''
+    line_comments = ()
+
 class NegraCorpusReader(ConllCorpusReader):
     """A corpus reader for NEGRA corpus files. A NEGRA corpus file consists out
     of annotated sentences separated by #BOS (beginning of sentence) and #EOS
@@ -92,6 +108,14 @@ class NegraCorpusReader(ConllCorpusReader):
     Because of similar corpus structure, this reader is based on and very
     similar to the ConllCorpusReader. Both corpora have their tokens structured
     as grid. NEGRA corpus file provide more token information though.
+
+    The data access methods accept an optional C{where} argument holding a
+    L{SentenceFilter}; sentences rejected by the filter are skipped while
+    the grid is read, before any words or trees are built for them.
+
+    A single reader may be shared by several threads: every thread reads
+    the corpus files through its own file handles, while the index of
+    sentence positions in the files is shared.
     """
 
     #==========================================================================
@@ -146,23 +170,36 @@ class NegraCorpusReader(ConllCorpusReader):
         self._bos = beginning_of_sentence
         self._eos = end_of_sentence
         self._colmap = dict((c,i) for (i,c) in enumerate(column_types))
+        self._grid_views = {}
+        self._grid_views_lock = threading.Lock()
 
         # Finish constructing by calling the extended class' constructor
         CorpusReader.__init__(self, root, fileids, encoding)
 
+    def __getstate__(self):
+        # the shared views are rebuilt on demand after unpickling
+        state = self.__dict__.copy()
+        del state['_grid_views'], state['_grid_views_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._grid_views = {}
+        self._grid_views_lock = threading.Lock()
+
     #==========================================================================
     # Data access methods
     #==========================================================================
 
-    def sents(self, fileids=None):
+    def sents(self, fileids=None, where=None):
         '''
         Retrieves a list of unannotated sentences from the
         corpus.
         '''
         self._require(self.WORDS)
-        return LazyMap(self._get_words, self._grids(fileids))
+        return LazyMap(self._get_words, self._grids(fileids, where))
 
-    def lemmatised_words(self, fileids=None):
+    def lemmatised_words(self, fileids=None, where=None):
         """Retrieve a list of lemmatised words. Words are encoded as tuples in
            C{(word, lemma)} form.
         @return: A list of words and their tuples.
@@ -171,9 +208,9 @@ class NegraCorpusReader(ConllCorpusReader):
 
         self._require(self.WORDS, self.LEMMA)
         return LazyConcatenation(LazyMap(self._get_lemmatised_words,
-                                         self._grids(fileids)))
+                                         self._grids(fileids, where)))
 
-    def lemmatised_sents(self, fileids=None):
+    def lemmatised_sents(self, fileids=None, where=None):
         """Retrieve a list of sentences and the words' lemma. Words
            are encoded as tuples in C{(word, lemma)} form.
         @return: A list of sentences with words and their lemma.
@@ -181,9 +218,10 @@ class NegraCorpusReader(ConllCorpusReader):
         """
 
         self._require(self.WORDS, self.LEMMA)
-        return LazyMap(self._get_lemmatised_words, self._grids(fileids))
+        return LazyMap(self._get_lemmatised_words,
+                       self._grids(fileids, where))
 
-    def morphological_words(self, fileids=None):
+    def morphological_words(self, fileids=None, where=None):
         """Retrieve a list of sentences with the words' morphological type.
            Words are encoded as tuples in C{(word, morph)} form.
         @return: A list of sentences with words and their morphological type.
@@ -192,9 +230,9 @@ class NegraCorpusReader(ConllCorpusReader):
 
         self._require(self.WORDS, self.MORPH)
         return LazyConcatenation(LazyMap(self._get_morphological_words,
-                                         self._grids(fileids)))
+                                         self._grids(fileids, where)))
 
-    def morphological_sents(self, fileids=None):
+    def morphological_sents(self, fileids=None, where=None):
         """Retrieve a list of sentences with the words' morphological type.
            Words are encoded as tuples in C{(word, morph)} form.
         @return: A list of sentences with words and their morphological type.
@@ -202,9 +240,10 @@ class NegraCorpusReader(ConllCorpusReader):
         """
 
         self._require(self.WORDS, self.MORPH)
-        return LazyMap(self._get_morphological_words, self._grids(fileids))
+        return LazyMap(self._get_morphological_words,
+                       self._grids(fileids, where))
 
-    def parsed_sents(self, fileids=None):
+    def parsed_sents(self, fileids=None, where=None):
         """
         Retrieve a list of parsed sents as L{Tree}. The tree
         leaves are bare strings containing the word, and are children
@@ -215,9 +254,10 @@ class NegraCorpusReader(ConllCorpusReader):
         """
 
         self._require(self.WORDS, self.POS, self.PARENT)
-        return LazyMap(self._get_parsed_words, self._grids(fileids))
+        return LazyMap(self._get_parsed_words, self._grids(fileids, where))
 
-    def parsed_sents_morph(self, fileids = None, secedge_copy = True):
+    def parsed_sents_morph(self, fileids = None, secedge_copy = True,
+                           where = None):
         """
         Retrieve a list of parsed sents as L{ParentedTree} with
         morphological information stored in the tree leaves. The tree
@@ -232,7 +272,50 @@ class NegraCorpusReader(ConllCorpusReader):
 
         self._require(self.WORDS, self.POS, self.PARENT, self.MORPH)
         return LazyMap(lambda g: self._get_parsed_words_morph(g, secedge_copy),
-                       self._grids(fileids))
+                       self._grids(fileids, where))
+
+    def tagged_words(self, fileids=None, tagset=None, where=None):
+        """Retrieve a list of tagged words. Words are encoded as tuples in
+           C{(word, tag)} form.
+        @return: A list of words and their tags.
+        @rtype: C{list} of C{(word, tag)}
+        """
+
+        self._require(self.WORDS, self.POS)
+        return LazyConcatenation(LazyMap(
+                lambda g: self._get_tagged_words(g, tagset),
+                self._grids(fileids, where)))
+
+    def tagged_sents(self, fileids=None, tagset=None, where=None):
+        """Retrieve a list of sentences with the words' tags. Words are
+           encoded as tuples in C{(word, tag)} form.
+        @return: A list of sentences with words and their tags.
+        @rtype: C{list} of C{list} of C{(word, tag)}
+        """
+
+        self._require(self.WORDS, self.POS)
+        return LazyMap(lambda g: self._get_tagged_words(g, tagset),
+                       self._grids(fileids, where))
+
+    def statistics(self, fileids=None, aggregates=None, where=None,
+                   processes=1):
+        """
+        Computes frequency tables of part of speech tags, morphological
+        tags, lemmata, edge labels, sentence lengths and tree depths in
+        a single pass over the raw grids, without building any trees.
+        With several C{processes}, the corpus files are split into byte
+        ranges which are counted in parallel.
+
+        @param aggregates: The names of the tables to compute; see
+            L{CorpusStatistics}. All of them by default.
+        @param where: An optional L{SentenceFilter}.
+        @param processes: The number of worker processes, or C{None}
+            for one per CPU.
+        @return: The requested frequency tables.
+        @rtype: L{CorpusStatistics}
+        """
+
+        return corpus_statistics(self, fileids, aggregates, where, processes)
 
     #==========================================================================
     # Transforms
@@ -333,31 +416,193 @@ class NegraCorpusReader(ConllCorpusReader):
                                                              parent=n),
                                         secedge_copy)
 
+    def _get_rows(self, grid):
+        """
+        Splits the grid into its terminal and nonterminal rows. Every
+        row is a tuple with one string per entry in C{COLUMN_TYPES}
+        (in that order); columns missing from the corpus are empty
+        strings. Further secondary edges of a node, given as more
+        secedge and parent column pairs after the declared columns,
+        are appended to its row. Nonterminal rows are the trailing
+        rows of the grid whose word column is a node number such as
+        C{#500}.
+
+        @return: The terminal rows and the nonterminal rows.
+        @rtype: C{tuple} of (C{list} of C{tuple}, C{list} of C{tuple})
+        """
+
+        indices = [self._colmap.get(column_type) for column_type
+                   in self.COLUMN_TYPES]
+        num_columns = len(self._column_types)
+        rows = [tuple((line[i] if i is not None and i < len(line) else '')
+                      for i in indices) + tuple(line[num_columns:])
+                for line in grid]
+        split = len(rows)
+        while (split > 0 and rows[split - 1][0].startswith('#') and
+               rows[split - 1][0][1:].isdigit()):
+            split -= 1
+        return rows[:split], rows[split:]
+
+    def _get_metadata(self, grid):
+        """
+        Retrieves the sentence number and the editor comments of a
+        sentence: the C{%%} comment on its #BOS line and those at the
+        end of its grid lines.
+
+        @return: The sentence number, the sentence comment and the
+            comments of the grid lines ('' where there is none).
+        @rtype: C{tuple} of (C{str}, C{str}, C{list} of C{str})
+        """
+
+        bos_line, _, comment = grid.bos_line.partition('%%')
+        fields = bos_line.split()
+        return (fields[1] if len(fields) > 1 else '', comment.strip(),
+                list(grid.line_comments))
+
 
     #==========================================================================
     # Grid reading
     #==========================================================================
 
-    def _read_grid_block(self, stream):
+    def _sentence_blocks(self, fileids=None, where=None):
+        """Returns the raw sentence blocks (grids) of the given files."""
+        return self._grids(fileids, where)
+
+    def _grids(self, fileids=None, where=None):
+        """
+        Overridden; allows filtering sentences while reading the grids.
+        Unfiltered grid views are created once per file and shared by
+        all accessors and threads, so that the index of sentence
+        positions is only built once.
+        """
+
+        return concurrent_concat([self._grid_view(path, enc, fileid, where)
+                                  for (path, enc, fileid)
+                                  in self.abspaths(fileids, True, True)])
+
+    def _grid_view(self, path, encoding, fileid, where=None):
+        """Returns a thread-safe view of the grids in a corpus file"""
+
+        if where is not None:
+            return ConcurrentStreamBackedCorpusView(
+                path,
+                lambda stream: self._read_grid_block(stream, where),
+                encoding=encoding)
+        with self._grid_views_lock:
+            if fileid not in self._grid_views:
+                self._grid_views[fileid] = ConcurrentStreamBackedCorpusView(
+                    path, self._read_grid_block, encoding=encoding)
+            return self._grid_views[fileid]
+
+    def _read_grid_block(self, stream, where=None):
         """Read blocks and return the grid"""
 
         # Sentence blocks are enclosed in start- and end-of-sentence tags.
         grids = []
         for block in read_regexp_block(stream, self._bos, self._eos):
-            block = block.strip()
-            if not block:
-                continue
-
-            # columns are separated by whitespace.
-            grids.append([line.split() for line in block.split("\n")[1:]])
+            grid = self._parse_grid_block(block, where)
+            if grid is not None:
+                grids.append(grid)
 
         return grids
 
+    def _parse_grid_block(self, block, where=None):
+        """
+        Turns a sentence block, starting with its #BOS line, into a
+        grid; returns C{None} for empty blocks and for sentences
+        rejected by the filter C{where}.
+        """
+
+        block = block.strip()
+        if not block:
+            return None
+
+        # columns are separated by whitespace.
+        lines = block.split("\n")
+        # a trailing %% editor comment is not part of the columns, and
+        # lines holding nothing but a comment are not part of the grid
+        grid = _Grid()
+        grid.bos_line = lines[0]
+        grid.line_comments = []
+        for line in lines[1:]:
+            columns = line.split()
+            comment = ''
+            if '%%' in line and '%%' in columns:
+                split = columns.index('%%')
+                columns, comment = (columns[:split],
+                                    ' '.join(columns[split + 1:]))
+            if columns:
+                grid.append(columns)
+                grid.line_comments.append(comment)
+        if where is not None and not self._accepts(where, lines[0], grid):
+            return None
+        return grid
+
+    def _sentence_blocks_in_range(self, fileid, start, end, where=None):
+        """
+        Yields the grids of the sentences whose #BOS line starts within
+        the byte range C{[start, end)} of a corpus file. Splitting a
+        file into consecutive ranges thus yields each sentence exactly
+        once, which allows dividing a file between worker processes.
+        """
+
+        encoding = self.encoding(fileid) or 'utf-8'
+        stream = self.abspath(fileid).open()
+        try:
+            # continue from the first line starting at or after start
+            if start > 0:
+                stream.seek(start - 1)
+                stream.readline()
+            lines = None
+            while True:
+                position = stream.tell()
+                line = stream.readline()
+                if not line:
+                    break
+                line = line.decode(encoding)
+                if lines is None:
+                    if re.match(self._bos, line):
+                        if position >= end:
+                            break
+                        lines = [line]
+                elif re.match(self._eos, line):
+                    grid = self._parse_grid_block(''.join(lines), where)
+                    if grid is not None:
+                        yield grid
+                    lines = None
+                else:
+                    lines.append(line)
+            if lines is not None:
+                grid = self._parse_grid_block(''.join(lines), where)
+                if grid is not None:
+                    yield grid
+        finally:
+            stream.close()
+
+    def _accepts(self, where, bos_line, grid):
+        """
+        Evaluates the sentence filter C{where} on the raw #BOS line
+        and grid of a sentence.
+        """
+
+        pos = self._colmap.get(self.POS)
+        words = self._colmap[self.WORDS]
+        tags = []
+        for line in grid:
+            word = line[words]
+            if word.startswith('#') and word[1:].isdigit():
+                break
+            tags.append(line[pos] if pos is not None and pos < len(line)
+                        else '')
+        comment = bos_line.partition('%%')[2].strip() or None
+        return where.accepts(tags, comment)
+
     #==========================================================================
     # Helper methods
     #==========================================================================
 
     @staticmethod
+    @instrumented('column_extraction')
     def _get_column(grid, column_index, filter=True):
         """Overridden; allows filtering sentence tree nodes from the grid"""
 
@@ -376,12 +621,13 @@ class NegraCorpusReader(ConllCorpusReader):
 # Package-Wide Helper methods
 #==============================================================================
 
+@instrumented('secedge_copy')
 def _copy_subtree_helper(nodes, subtree_word, edge, parent_word,
                          tokens, node_class, node_builder):
     '''
     Copies a subtree of a parse tree to "unravel" secondary edges.
     '''
-    subtree_copy = node_class(nodes[subtree_word].node, [])
+    subtree_copy = node_class(nodes[subtree_word].label(), [])
     subtree_copy.grid_lineno = nodes[subtree_word].grid_lineno
     subtree_copy.edge = edge
     todo = []
@@ -390,7 +636,7 @@ def _copy_subtree_helper(nodes, subtree_word, edge, parent_word,
     while todo:
         (subtree_parent, current) = todo.pop(0)
         if isinstance(current, node_class):
-            current_copy = node_class(current.node, [])
+            current_copy = node_class(current.label(), [])
             current_copy.grid_lineno = current.grid_lineno
             current_copy.edge = current.edge
             for child in current:
@@ -402,6 +648,7 @@ def _copy_subtree_helper(nodes, subtree_word, edge, parent_word,
         subtree_parent.append(current_copy)
     nodes[parent_word].append(subtree_copy)
 
+@instrumented('tree_building')
 def _get_parsed_words_helper(tokens, node_class, node_builder,
                              secedge_copy = True):
     """
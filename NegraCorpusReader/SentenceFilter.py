@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+SentenceFilter.py
+
+Sentence filters evaluated on the raw sentence annotation.
+'''
+
+class SentenceFilter(object):
+    '''
+    A filter specification which can be passed as the C{where}
+    argument of the data access methods of C{NegraCorpusReader} and
+    C{TigerXMLCorpusReader}. The readers evaluate the filter on the
+    raw grid lines or C{<terminals>} element of each sentence while
+    reading it, so sentences which are rejected never have their
+    words, tuples or trees built.
+
+    A sentence is accepted if it satisfies all of the given criteria.
+    '''
+
+    def __init__(self, min_length=None, max_length=None, tags=None,
+                 exclude_comments=False):
+        '''
+        Creates a new sentence filter.
+
+        Arguments:
+        - `min_length`: the minimum number of tokens in a sentence
+        - `max_length`: the maximum number of tokens in a sentence
+        - `tags`: a collection of part of speech tags; the sentence
+          must contain at least one of them
+        - `exclude_comments`: if true, reject sentences with a comment:
+          a C{%%} comment on the C{#BOS} line in the NEGRA format, a
+          C{comment} attribute of the C{<s>} element in TIGER XML
+        '''
+        self.min_length       = min_length
+        self.max_length       = max_length
+        self.tags             = (frozenset(tags) if tags is not None
+                                 else None)
+        self.exclude_comments = exclude_comments
+
+    def accepts(self, tags, comment=None):
+        '''
+        Decides whether a sentence passes the filter.
+
+        Arguments:
+        - `tags`: the part of speech tags of the sentence's tokens
+        - `comment`: the sentence comment, or C{None} if there is none
+
+        @rtype: C{bool}
+        '''
+        if self.min_length is not None and len(tags) < self.min_length:
+            return False
+        if self.max_length is not None and len(tags) > self.max_length:
+            return False
+        if self.tags is not None and self.tags.isdisjoint(tags):
+            return False
+        if self.exclude_comments and comment:
+            return False
+        return True
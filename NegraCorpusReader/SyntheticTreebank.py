@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+SyntheticTreebank.py
+
+Generate synthetic treebanks in the NEGRA export format and in TIGER
+XML, for testing and benchmarking the corpus readers without access
+to licensed corpora.
+
+The generated sentences have random constituent trees of bounded
+depth over a Zipf-like vocabulary, end in a punctuation token
+attached to the virtual root like TIGER sentences do, and carry
+secondary edges on a configurable share of their nodes.
+
+Usage::
+
+    python -m NegraCorpusReader.SyntheticTreebank DIRECTORY [options]
+'''
+
+from .CorpusWriter import write_negra, write_tiger_xml
+import argparse
+import io
+import os
+import random
+
+TAGS      = ('ART', 'NN', 'ADJA', 'VVFIN', 'APPR', 'ADV', 'PPER', 'KON',
+             'VAFIN', 'NE', 'PPOSAT', 'VVINF')
+MORPHS    = ('Nom.Sg.Masc', 'Acc.Sg.Fem', 'Dat.Pl.Neut', 'Gen.Sg.Neut',
+             '3.Sg.Pres.Ind', '3.Pl.Past.Ind', 'Pos', '--')
+CATEGORIES = ('NP', 'VP', 'PP', 'AP', 'S', 'CNP', 'AVP')
+EDGES     = ('SB', 'OA', 'HD', 'NK', 'MO', 'CJ', 'DA', 'OC', 'AC')
+SECEDGES  = ('SB', 'OA', 'OC', 'HD', 'EP')
+
+def synthetic_sentence(rand, sent_length=15, depth=4, secedge_density=0.0,
+                       vocab_size=5000):
+    '''
+    Generates a random sentence as NEGRA export rows.
+
+    Arguments:
+    - `rand`: the C{random.Random} instance to draw from
+    - `sent_length`: the mean sentence length in tokens, including the
+      final punctuation; lengths vary by up to half of it
+    - `depth`: the maximum number of nonterminal levels in the tree
+    - `secedge_density`: the probability for each token and inner
+      nonterminal to carry a secondary edge
+    - `vocab_size`: the number of distinct words
+
+    @return: The terminal rows and the nonterminal rows.
+    @rtype: C{tuple} of (C{list} of C{tuple}, C{list} of C{tuple})
+    '''
+    num_words = max(1, rand.randint(sent_length - sent_length // 2,
+                                    sent_length + sent_length // 2) - 1)
+    parents   = [0] * num_words
+    # nonterminals as [number, category, edge, parent]
+    nodes     = [[500, 'S', '--', 0]]
+
+    def build(start, end, level, parent):
+        while start < end:
+            size = rand.randint(1, max(1, (end - start + 1) // 2))
+            stop = min(end, start + size)
+            if level < depth and stop - start > 1 and rand.random() < 0.7:
+                number = 500 + len(nodes)
+                nodes.append([number, rand.choice(CATEGORIES),
+                              rand.choice(EDGES), parent])
+                build(start, stop, level + 1, number)
+            else:
+                for idx in range(start, stop):
+                    parents[idx] = parent
+            start = stop
+    build(0, num_words, 1, 500)
+
+    node_parents = dict((node[0], node[3]) for node in nodes)
+    def ancestors(number):
+        while number:
+            yield number
+            number = node_parents[number]
+
+    def secedge(parent, excluded):
+        targets = [node[0] for node in nodes
+                   if node[0] != parent and node[0] not in excluded]
+        if targets and rand.random() < secedge_density:
+            return (rand.choice(SECEDGES), str(rand.choice(targets)))
+        return ('', '')
+
+    terminals = []
+    for parent in parents:
+        idx = int(vocab_size ** rand.random()) - 1
+        terminals.append(('w%d' % idx, 'l%d' % idx, TAGS[idx % len(TAGS)],
+                          MORPHS[idx % len(MORPHS)], rand.choice(EDGES),
+                          str(parent)) + secedge(parent, ()))
+    terminals.append(('.', '--', '$.', '--', '--', '0', '', ''))
+
+    nonterminals = []
+    for number, category, edge, parent in nodes:
+        if parent:
+            # a node can't be a secondary child of its own subtree
+            descendants = set(node[0] for node in nodes
+                              if number in ancestors(node[0]))
+            extra = secedge(parent, descendants)
+        else:
+            extra = ('', '')
+        nonterminals.append(('#%d' % number, '--', category, '--', edge,
+                             str(parent)) + extra)
+    return terminals, nonterminals
+
+def synthetic_sentences(num_sents=1000, seed=0, **kwargs):
+    '''
+    Generates random sentences; see L{synthetic_sentence} for the
+    keyword arguments.
+
+    Arguments:
+    - `num_sents`: the number of sentences
+    - `seed`: the random seed, so that corpora can be regenerated
+    '''
+    rand = random.Random(seed)
+    for i in range(num_sents):
+        yield synthetic_sentence(rand, **kwargs)
+
+def write_synthetic_corpus(directory, name='synthetic', **kwargs):
+    '''
+    Writes the same synthetic corpus as a NEGRA export file and as a
+    TIGER XML file; see L{synthetic_sentences} for the keyword
+    arguments.
+
+    Arguments:
+    - `directory`: the directory to write the files to
+    - `name`: the base name of the files
+
+    @return: The file names of the NEGRA and the TIGER XML file,
+             relative to C{directory}.
+    @rtype: C{tuple} of (C{str}, C{str})
+    '''
+    negra_fileid = name + '.export'
+    tiger_fileid = name + '.xml'
+    with io.open(os.path.join(directory, negra_fileid), 'w',
+                 encoding='utf-8') as stream:
+        write_negra(synthetic_sentences(**kwargs), stream)
+    with io.open(os.path.join(directory, tiger_fileid), 'w',
+                 encoding='utf-8') as stream:
+        write_tiger_xml(synthetic_sentences(**kwargs), stream, name)
+    return negra_fileid, tiger_fileid
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('directory')
+    parser.add_argument('--name', default='synthetic')
+    parser.add_argument('--sents', type=int, default=1000)
+    parser.add_argument('--length', type=int, default=15)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--secedges', type=float, default=0.02)
+    parser.add_argument('--vocab', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print('\n'.join(write_synthetic_corpus(args.directory, args.name,
+                                           num_sents=args.sents,
+                                           seed=args.seed,
+                                           sent_length=args.length,
+                                           depth=args.depth,
+                                           secedge_density=args.secedges,
+                                           vocab_size=args.vocab)))
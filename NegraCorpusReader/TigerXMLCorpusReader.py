@@ -8,15 +8,36 @@ TigerXMLCorpusReader.py
 Read TIGER corpus files in XML format.
 '''
 
-from nltk.corpus.reader.util    import concat
-from nltk.corpus.reader.xmldocs import XMLCorpusReader, XMLCorpusView
+from nltk.corpus.reader.xmldocs import XMLCorpusReader
 from nltk.tree                  import Tree, ParentedTree
 from nltk.util                  import LazyConcatenation, LazyMap
 from .NegraCorpusReader         import Atom
+from .ConcurrentCorpusView      import ConcurrentXMLCorpusView
+from .ConcurrentCorpusView      import concurrent_concat
+from .CorpusStatistics          import corpus_statistics
+from .Instrumentation           import instrumented
+from xml.etree                  import ElementTree
+import re
+import threading
+
+# Start and end tags of sentence elements
+_SENTENCE_START = re.compile(br'<s[\s>]')
+_SENTENCE_END   = re.compile(br'</s\s*>')
+# Size of the chunks in which the raw corpus file is scanned
+_CHUNK_SIZE     = 1 << 16
 
 class TigerXMLCorpusReader(XMLCorpusReader):
     '''
     Corpus reader for the TIGER XML corpus.
+
+    The data access methods accept an optional C{where} argument
+    holding a L{SentenceFilter}; sentences rejected by the filter are
+    skipped as soon as their C{<s>} element has been read, before any
+    words or trees are built for them.
+
+    A single reader may be shared by several threads: every thread
+    reads the corpus files through its own file handles, while the
+    index of sentence positions in the files is shared.
     '''
 
     def __init__(self, root, fileids):
@@ -28,34 +49,51 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         - `fileids`: the XML filename of the TIGER corpus
         '''
         super().__init__(root, fileids)
+        self._sentence_views      = {}
+        self._sentence_views_lock = threading.Lock()
+
+    def __getstate__(self):
+        # the shared views are rebuilt on demand after unpickling
+        state = self.__dict__.copy()
+        del state['_sentence_views'], state['_sentence_views_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sentence_views      = {}
+        self._sentence_views_lock = threading.Lock()
 
     #==========================================================================
     # Data access methods
     #==========================================================================
 
-    def words(self, fileids=None):
+    def words(self, fileids=None, where=None):
         '''
         Returns all of the words and punctuation symbols that were in
         text nodes.
         '''
         return LazyConcatenation(LazyMap(self._get_words,
-                                         self._sentence_etrees(fileids)))
+                                         self._sentence_etrees(fileids,
+                                                               where)))
 
-    def sents(self, fileids=None):
+    def sents(self, fileids=None, where=None):
         '''
         Retrieves a list of unannotated sentences from the
         corpus.
         '''
-        return LazyMap(self._get_words, self._sentence_etrees(fileids))
+        return LazyMap(self._get_words,
+                       self._sentence_etrees(fileids, where))
 
-    def tagged_words(self, fileids=None):
+    def tagged_words(self, fileids=None, where=None):
         return LazyConcatenation(LazyMap(self._get_tagged_words,
-                                         self._sentence_etrees(fileids)))
+                                         self._sentence_etrees(fileids,
+                                                               where)))
 
-    def tagged_sents(self, fileids=None):
-        return LazyMap(self._get_tagged_words, self._sentence_etrees(fileids))
+    def tagged_sents(self, fileids=None, where=None):
+        return LazyMap(self._get_tagged_words,
+                       self._sentence_etrees(fileids, where))
 
-    def lemmatised_words(self, fileids=None):
+    def lemmatised_words(self, fileids=None, where=None):
         '''
         Retrieve a list of lemmatised words. Words are encoded as
         tuples in C{(word, lemma)} form.
@@ -64,9 +102,10 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of C{(word, lemma)}
         '''
         return LazyConcatenation(LazyMap(self._get_lemmatised_words,
-                                         self._sentence_etrees(fileids)))
+                                         self._sentence_etrees(fileids,
+                                                               where)))
 
-    def lemmatised_sents(self, fileids=None):
+    def lemmatised_sents(self, fileids=None, where=None):
         '''
         Retrieve a list of sentences and the words' lemma. Words are
         encoded as tuples in C{(word, lemma)} form.
@@ -75,9 +114,9 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of C{list} of C{(word, lemma)}
         '''
         return LazyMap(self._get_lemmatised_words,
-                       self._sentence_etrees(fileids))
+                       self._sentence_etrees(fileids, where))
 
-    def morphological_words(self, fileids=None):
+    def morphological_words(self, fileids=None, where=None):
         '''
         Retrieve a list of sentences with the words' morphological
         type.  Words are encoded as tuples in C{(word, morph)} form.
@@ -86,9 +125,10 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of C{(word, morph)}
         '''
         return LazyConcatenation(LazyMap(self._get_morphological_words,
-                                         self._sentence_etrees(fileids)))
+                                         self._sentence_etrees(fileids,
+                                                               where)))
 
-    def morphological_sents(self, fileids=None):
+    def morphological_sents(self, fileids=None, where=None):
         '''
         Retrieve a list of sentences with the words' morphological
         type. Words are encoded as tuples in C{(word, morph)} form.
@@ -97,9 +137,9 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of C{list} of C{(word, morph)}
         '''
         return LazyMap(self._get_morphological_words,
-                       self._sentence_etrees(fileids))
+                       self._sentence_etrees(fileids, where))
 
-    def parsed_sents(self, fileids=None):
+    def parsed_sents(self, fileids=None, where=None):
         '''
         Retrieve a list of parsed sents as L{Tree}. The tree
         leaves are bare strings containing the word, and are children
@@ -109,9 +149,10 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of L{Tree}
         '''
         return LazyMap(self._get_parsed_words,
-                       self._sentence_etrees(fileids))
+                       self._sentence_etrees(fileids, where))
 
-    def parsed_sents_morph(self, fileids = None, secedge_copy = True):
+    def parsed_sents_morph(self, fileids = None, secedge_copy = True,
+                           where = None):
         '''
         Retrieve a list of parsed sents as L{ParentedTree} with
         morphological information stored in the tree leaves. The tree
@@ -124,25 +165,112 @@ class TigerXMLCorpusReader(XMLCorpusReader):
         @rtype: C{list} of L{ParentedTree}
         '''
         return LazyMap(lambda s: self._get_parsed_words_morph(s, secedge_copy),
-                       self._sentence_etrees(fileids))
+                       self._sentence_etrees(fileids, where))
+
+    def statistics(self, fileids=None, aggregates=None, where=None,
+                   processes=1):
+        '''
+        Computes frequency tables of part of speech tags,
+        morphological tags, lemmata, edge labels, sentence lengths and
+        tree depths in a single pass over the raw C{<s>} elements,
+        without building any trees. With several C{processes}, the
+        corpus files are split into byte ranges which are counted in
+        parallel.
+
+        Arguments:
+        - `aggregates`: the names of the tables to compute (see
+          L{CorpusStatistics}); all of them by default
+        - `where`: an optional L{SentenceFilter}
+        - `processes`: the number of worker processes, or C{None} for
+          one per CPU
+
+        @return: The requested frequency tables.
+        @rtype: L{CorpusStatistics}
+        '''
+        return corpus_statistics(self, fileids, aggregates, where, processes)
 
     #==========================================================================
     # Transforms
     #==========================================================================
 
-    def _sentence_etrees(self, fileids=None):
-        return concat([XMLCorpusView(fileid, '.*/s')
-                       for fileid in self.abspaths(fileids)])
+    def _sentence_etrees(self, fileids=None, where=None):
+        return concurrent_concat([self._sentence_view(path, fileid, where)
+                                  for (path, fileid)
+                                  in self.abspaths(fileids, False, True)])
+
+    def _sentence_view(self, path, fileid, where=None):
+        '''
+        Returns a thread-safe view of the C{<s>} elements in a corpus
+        file. Unfiltered views are created once per file and shared by
+        all accessors and threads, so that the index of sentence
+        positions is only built once.
+        '''
+        if where is not None:
+            return _FilteredXMLCorpusView(path, '.*/s', where)
+        with self._sentence_views_lock:
+            if fileid not in self._sentence_views:
+                self._sentence_views[fileid] = ConcurrentXMLCorpusView(path,
+                                                                       '.*/s')
+            return self._sentence_views[fileid]
+
+    def _sentence_blocks(self, fileids=None, where=None):
+        '''Returns the raw sentence blocks (C{<s>} elements) of the files.'''
+        return self._sentence_etrees(fileids, where)
+
+    def _sentence_blocks_in_range(self, fileid, start, end, where=None):
+        '''
+        Yields the C{<s>} elements whose start tag begins within the
+        byte range C{[start, end)} of a corpus file. Splitting a file
+        into consecutive ranges thus yields each sentence exactly once,
+        which allows dividing a file between worker processes.
+        '''
+        stream = self.abspath(fileid).open()
+        try:
+            declaration = re.match(br'<\?xml[^>]*encoding=["\']([^"\']+)',
+                                   stream.read(200))
+            encoding = (declaration.group(1).decode('ascii')
+                        if declaration else 'utf-8')
+            stream.seek(start)
+            buffer, offset = b'', start
+            while True:
+                match = _SENTENCE_START.search(buffer)
+                if match is None:
+                    if offset + len(buffer) >= end:
+                        break
+                    chunk = stream.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # keep a possibly truncated start tag
+                    offset += max(0, len(buffer) - 2)
+                    buffer  = buffer[-2:] + chunk
+                    continue
+                if offset + match.start() >= end:
+                    break
+                end_match = _SENTENCE_END.search(buffer, match.end())
+                if end_match is None:
+                    chunk = stream.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    buffer += chunk
+                    continue
+                sentence_etree = ElementTree.fromstring(
+                    buffer[match.start():end_match.end()].decode(encoding))
+                if where is None or _accepts(where, sentence_etree):
+                    yield sentence_etree
+                offset += end_match.end()
+                buffer  = buffer[end_match.end():]
+        finally:
+            stream.close()
 
     def _get_lemmatised_words(self, sentence_etree):
         graph = sentence_etree.find('graph')
         return [(str(terminal.get('word')), str(terminal.get('lemma'))) for
-                terminal in graph.getiterator("t")]
+                terminal in graph.iter("t")]
 
     def _get_morphological_words(self, sentence_etree):
         graph = sentence_etree.find('graph')
         return [(str(terminal.get('word')), str(terminal.get('morph'))) for
-                terminal in graph.getiterator("t")]
+                terminal in graph.iter("t")]
 
     def _get_parsed_words(self, sentence_etree):
         '''
@@ -185,12 +313,138 @@ class TigerXMLCorpusReader(XMLCorpusReader):
     def _get_tagged_words(self, sentence_etree):
         graph = sentence_etree.find('graph')
         return [(str(terminal.get('word')), str(terminal.get('pos'))) for
-                terminal in graph.getiterator("t")]
+                terminal in graph.iter("t")]
 
     def _get_words(self, sentence_etree):
         graph = sentence_etree.find('graph')
-        return [str(terminal.get('word')) for terminal in graph.getiterator("t")]
+        return [str(terminal.get('word')) for terminal in graph.iter("t")]
+
+    def _get_rows(self, sentence_etree):
+        '''
+        Flattens the sentence into NEGRA export rows, so that code
+        working on the raw sentence annotation can treat both corpus
+        formats alike. Every row is a tuple with one string per entry
+        in C{NegraCorpusReader.COLUMN_TYPES}, followed by a secedge and
+        parent pair for each further secondary edge; nonterminals are
+        numbered after their TIGER id (C{s1_500} becomes C{#500}) or,
+        if it doesn't end in a number, above all numbered nodes, and
+        a virtual root is dropped in favour of parent C{0}, as in the
+        NEGRA export format.
+
+        @return: The terminal rows and the nonterminal rows.
+        @rtype: C{tuple} of (C{list} of C{tuple}, C{list} of C{tuple})
+        '''
+        graph        = sentence_etree.find('graph')
+        vroot_id     = graph.get('root')
+        nonterminals = list(graph.iter('nt'))
+        skip_vroot   = _skips_vroot(vroot_id, nonterminals)
+        # nodes without a numeric id are numbered after the largest
+        # numeric one, so that no two nodes share a number
+        suffixes = [nonterminal.get('id').rsplit('_', 1)[-1]
+                    for nonterminal in nonterminals]
+        next_number = max([int(suffix) for suffix in suffixes
+                           if suffix.isdigit()] + [499]) + 1
+        numbers = {}
+        for nonterminal, suffix in zip(nonterminals, suffixes):
+            nt_id = nonterminal.get('id')
+            if nt_id == vroot_id and skip_vroot:
+                numbers[nt_id] = '0'
+            elif suffix.isdigit():
+                numbers[nt_id] = suffix
+            else:
+                numbers[nt_id] = str(next_number)
+                next_number += 1
+        edges = {}
+        for nonterminal in nonterminals:
+            for edge in nonterminal.iter('edge'):
+                edges[edge.get('idref')] = (str(edge.get('label')),
+                                            numbers[nonterminal.get('id')])
+
+        def row(element, word, lemma, pos, morph):
+            edge, parent = edges.get(element.get('id'), ('--', '0'))
+            secedges     = ()
+            for secedge in element.iter('secedge'):
+                if secedge.get('idref') in numbers:
+                    secedges += (str(secedge.get('label')),
+                                 numbers[secedge.get('idref')])
+            return ((word, lemma, pos, morph, edge, parent) +
+                    (secedges or ('', '')))
+
+        terminals = [row(terminal,
+                         str(terminal.get('word')),
+                         terminal.get('lemma', ''),
+                         terminal.get('pos', ''),
+                         terminal.get('morph', ''))
+                     for terminal in graph.iter('t')]
+        nonterminals = [row(nonterminal,
+                            '#' + numbers[nonterminal.get('id')],
+                            '--',
+                            str(nonterminal.get('cat')),
+                            '--')
+                        for nonterminal in nonterminals
+                        if not (nonterminal.get('id') == vroot_id and
+                                skip_vroot)]
+        return terminals, nonterminals
+
+    def _get_metadata(self, sentence_etree):
+        '''
+        Retrieves the sentence id and the comments of a sentence, which
+        are kept in C{comment} attributes of the C{<s>}, C{<t>} and
+        C{<nt>} elements.
+
+        @return: The sentence id, the sentence comment and the comments
+            of the rows returned by C{_get_rows()} ('' where there is
+            none).
+        @rtype: C{tuple} of (C{str}, C{str}, C{list} of C{str})
+        '''
+        graph        = sentence_etree.find('graph')
+        vroot_id     = graph.get('root')
+        nonterminals = list(graph.iter('nt'))
+        skip_vroot   = _skips_vroot(vroot_id, nonterminals)
+        line_comments = ([terminal.get('comment', '')
+                          for terminal in graph.iter('t')] +
+                         [nonterminal.get('comment', '')
+                          for nonterminal in nonterminals
+                          if not (nonterminal.get('id') == vroot_id and
+                                  skip_vroot)])
+        return (sentence_etree.get('id', ''),
+                sentence_etree.get('comment', ''),
+                line_comments)
+
+class _FilteredXMLCorpusView(ConcurrentXMLCorpusView):
+    '''
+    An XML corpus view over C{<s>} elements which drops the sentences
+    rejected by a L{SentenceFilter} as soon as their elements have
+    been read.
+    '''
+
+    def __init__(self, fileid, tagspec, where):
+        super().__init__(fileid, tagspec)
+        self._where = where
+
+    def read_block(self, stream, tagspec=None, elt_handler=None):
+        return [sentence_etree for sentence_etree
+                in super().read_block(stream, tagspec, elt_handler)
+                if _accepts(self._where, sentence_etree)]
+
+def _skips_vroot(vroot_id, nonterminals):
+    '''
+    Decides whether the virtual root of a sentence graph is left out
+    of its tree, because there is a real root node below it.
+    '''
+    return ((vroot_id.split('_')[1].lower() == 'vroot') and
+            len(nonterminals) > 1)
+
+def _accepts(where, sentence_etree):
+    '''
+    Evaluates the sentence filter C{where} on the C{<terminals>} and
+    the C{comment} attribute of a sentence element.
+    '''
+    return where.accepts([terminal.get('pos') for terminal
+                          in sentence_etree.find('graph').iter('t')],
+                         sentence_etree.get('comment') or None)
 
+@instrumented('secedge_copy')
 def _copy_subtree_helper(subtree, label, parent_idref, tokens, terminal_etrees,
                          tree_class, atom_builder):
     subtree_copy             = tree_class(subtree.label(), [])
@@ -217,6 +471,7 @@ def _copy_subtree_helper(subtree, label, parent_idref, tokens, terminal_etrees,
         subtree_parent.append(current_copy)
     tokens[parent_idref].append(subtree_copy)
 
+@instrumented('tree_building')
 def _sentence_etree_to_tree(sentence_etree, tree_class, atom_builder,
                             secedge_copy = True):
     '''
@@ -226,13 +481,13 @@ def _sentence_etree_to_tree(sentence_etree, tree_class, atom_builder,
     graph           = sentence_etree.find('graph')
     vroot_id        = graph.get('root')
     skip_vroot      = ((vroot_id.split('_')[1].lower() == 'vroot') and
-                       len(list(graph.getiterator('nt'))) > 1)
+                       len(list(graph.iter('nt'))) > 1)
     tokens          = {}
     secedges        = []
     terminal_etrees = {}
     terminal_ids    = set()
     # build the list of terminals
-    for idx, terminal in enumerate(graph.getiterator('t')):
+    for idx, terminal in enumerate(graph.iter('t')):
         tok = tree_class(str(terminal.get('pos')), [])
         tok.grid_lineno = idx
         tok.edge        = None
@@ -241,33 +496,33 @@ def _sentence_etree_to_tree(sentence_etree, tree_class, atom_builder,
         tokens[terminal.get('id')] = tok
         terminal_ids.add(terminal.get('id'))
         terminal_etrees[idx] = terminal
-        for secedge in terminal.getiterator('secedge'):
+        for secedge in terminal.iter('secedge'):
             secedges.append((tok, str(secedge.get('label')),
                              secedge.get('idref')))
     num_terminals = len(tokens)
     root_id       = (None if skip_vroot else vroot_id)
     # build the list of non-terminals
-    for idx, nonterminal in enumerate(graph.getiterator('nt')):
+    for idx, nonterminal in enumerate(graph.iter('nt')):
         idx += num_terminals
         if not (nonterminal.get('id') == vroot_id and skip_vroot):
             tok = tree_class(str(nonterminal.get('cat')), [])
             tok.grid_lineno = idx
             tok.edge        = None
             tokens[nonterminal.get('id')] = tok
-            for secedge in nonterminal.getiterator('secedge'):
+            for secedge in nonterminal.iter('secedge'):
                 secedges.append((tok, str(secedge.get('label')),
                                  secedge.get('idref')))
         else:
-            for edge in nonterminal.getiterator('edge'):
+            for edge in nonterminal.iter('edge'):
                 if edge.get('idref') not in terminal_ids:
                     root_id = edge.get('idref')
     # attach terminals and non-terminals to their parents using the
     # information in <edge> tags
     attached_ids = set()
-    for nonterminal in graph.getiterator('nt'):
+    for nonterminal in graph.iter('nt'):
         if not (nonterminal.get('id') == vroot_id and skip_vroot):
             tok = tokens[nonterminal.get('id')]
-            for edge in nonterminal.getiterator('edge'):
+            for edge in nonterminal.iter('edge'):
                 # we can't attach the same constituent to two
                 # different parents
                 if edge.get('idref') in attached_ids:
@@ -281,7 +536,7 @@ def _sentence_etree_to_tree(sentence_etree, tree_class, atom_builder,
                     child[0].edge = str(edge.get('label'))
                 tok.append(child)
         else:
-            for edge in nonterminal.getiterator('edge'):
+            for edge in nonterminal.iter('edge'):
                 if edge.get('idref') != root_id:
                     child = tokens[edge.get('idref')]
                     child.edge = str(edge.get('label'))
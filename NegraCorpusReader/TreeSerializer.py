@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+TreeSerializer.py
+
+Compact binary serialization of batches of parsed sentences.
+
+The trees returned by C{parsed_sents()} and C{parsed_sents_morph()}
+carry C{Atom} leaves with back-pointers to their parents and ad-hoc
+node attributes (C{grid_lineno}, C{edge}, C{secedge}, C{comment}),
+which makes them slow and bulky to pickle. L{dumps_trees} flattens a
+batch of trees into a single array of integers plus one string table
+shared by the whole batch; L{loads_trees} rebuilds them, restoring
+the node attributes, the C{Atom} properties and all parent links.
+
+Usage::
+
+    python -m NegraCorpusReader.TreeSerializer ROOT FILEID [NUM_SENTS]
+
+benchmarks the serializer against pickle on a NEGRA export file.
+'''
+
+from array     import array
+from nltk.tree import Tree, ParentedTree
+from .NegraCorpusReader import Atom
+import pickle
+import struct
+import sys
+import time
+
+# Format identifier and version
+MAGIC = b'NTS1'
+
+# Markers in the integer stream
+_NO_TREE    = -1    # a sentence which could not be parsed (None)
+_TREE       = 0     # an inner tree node
+_ATOM       = 1     # an Atom leaf
+_STRING     = 2     # a bare string leaf
+_NONE       = -1    # an attribute value of None
+_ABSENT     = -2    # an attribute which is not set
+
+# Tree classes, by their code in the integer stream
+_TREE_CLASSES = (Tree, ParentedTree)
+
+# Attributes stored on inner tree nodes and on Atoms
+_NODE_ATTRIBUTES = ('edge', 'secedge', 'comment')
+_ATOM_ATTRIBUTES = ('word', 'tag', 'morph', 'lemma', 'edge', 'secedge',
+                    'comment')
+
+def dumps_trees(trees):
+    '''
+    Serializes a batch of trees. The batch may contain C{None} in
+    place of sentences which could not be parsed.
+
+    Arguments:
+    - `trees`: an iterable of L{Tree}, L{ParentedTree} or C{None}
+
+    @return: The serialized batch.
+    @rtype: C{bytes}
+    '''
+    strings = {}
+    def string(value):
+        if value is None:
+            return _NONE
+        code = strings.get(value)
+        if code is None:
+            code = strings[value] = len(strings)
+        return code
+
+    def lineno(value):
+        return _NONE if value is None else value
+
+    ints   = array('i')
+    append = ints.append
+    def dump(node):
+        if isinstance(node, Tree):
+            append(_TREE)
+            append(string(node.label()))
+            append(lineno(getattr(node, 'grid_lineno', _ABSENT)))
+            for name in _NODE_ATTRIBUTES:
+                if hasattr(node, name):
+                    append(string(getattr(node, name)))
+                else:
+                    append(_ABSENT)
+            append(len(node))
+            for child in node:
+                dump(child)
+        elif isinstance(node, Atom):
+            append(_ATOM)
+            for name in _ATOM_ATTRIBUTES:
+                append(string(getattr(node, name)))
+            append(lineno(node.grid_lineno))
+        else:
+            append(_STRING)
+            append(string(node))
+
+    num_trees = 0
+    for tree in trees:
+        if tree is None:
+            append(_NO_TREE)
+        else:
+            append(_TREE_CLASSES.index(type(tree)))
+            dump(tree)
+        num_trees += 1
+
+    table = [None] * len(strings)
+    for value, code in strings.items():
+        table[code] = value
+    table = '\0'.join(table).encode('utf-8')
+    return b''.join([MAGIC,
+                     struct.pack('<III', num_trees, len(strings), len(table)),
+                     table,
+                     ints.tobytes()])
+
+def loads_trees(data):
+    '''
+    Deserializes a batch of trees written by L{dumps_trees}.
+
+    Arguments:
+    - `data`: the serialized batch
+
+    @return: The trees, with C{None} for unparsed sentences.
+    @rtype: C{list} of L{Tree}, L{ParentedTree} or C{None}
+    '''
+    if data[:4] != MAGIC:
+        raise ValueError('Not a serialized tree batch.')
+    num_trees, num_strings, table_size = struct.unpack_from('<III', data, 4)
+    offset = 4 + struct.calcsize('<III')
+    table  = (data[offset:offset + table_size].decode('utf-8').split('\0')
+              if num_strings else [])
+    ints   = array('i')
+    ints.frombytes(data[offset + table_size:])
+    ints   = ints.tolist()
+
+    def string(code):
+        return None if code == _NONE else table[code]
+
+    position = 0
+    def load(tree_class):
+        nonlocal position
+        kind = ints[position]
+        if kind == _TREE:
+            label, grid_lineno = ints[position + 1:position + 3]
+            attributes = ints[position + 3:position + 6]
+            num_children = ints[position + 6]
+            position += 7
+            children = [load(tree_class) for i in range(num_children)]
+            node = tree_class(table[label], children)
+            for child in children:
+                if isinstance(child, Atom):
+                    child._parent = node
+            if grid_lineno != _ABSENT:
+                node.grid_lineno = (None if grid_lineno == _NONE
+                                    else grid_lineno)
+            for name, code in zip(_NODE_ATTRIBUTES, attributes):
+                if code != _ABSENT:
+                    setattr(node, name, string(code))
+            return node
+        elif kind == _ATOM:
+            fields = [string(code)
+                      for code in ints[position + 1:position + 8]]
+            grid_lineno = ints[position + 8]
+            position += 9
+            return Atom(*fields,
+                        grid_lineno=(None if grid_lineno == _NONE
+                                     else grid_lineno))
+        else:
+            position += 2
+            return table[ints[position - 1]]
+
+    trees = []
+    for i in range(num_trees):
+        code = ints[position]
+        position += 1
+        if code == _NO_TREE:
+            trees.append(None)
+        else:
+            trees.append(load(_TREE_CLASSES[code]))
+    return trees
+
+def benchmark(trees, repeat=3):
+    '''
+    Compares L{dumps_trees} and L{loads_trees} against pickle on a
+    batch of trees.
+
+    Arguments:
+    - `trees`: a list of trees
+    - `repeat`: how often to time each operation; the best time counts
+
+    @return: For both serializers, the serialized size in bytes and the
+             best dump and load times in seconds.
+    @rtype: C{dict} of C{str} to C{tuple} of (C{int}, C{float}, C{float})
+    '''
+    def best_time(function, argument):
+        times = []
+        for i in range(repeat):
+            start  = time.perf_counter()
+            result = function(argument)
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    results = {}
+    for name, dumps, loads in (
+        ('pickle', lambda t: pickle.dumps(t, pickle.HIGHEST_PROTOCOL),
+         pickle.loads),
+        ('TreeSerializer', dumps_trees, loads_trees)):
+        data, dump_time = best_time(dumps, trees)
+        _, load_time    = best_time(loads, data)
+        results[name]   = (len(data), dump_time, load_time)
+    return results
+
+if __name__ == '__main__':
+    from .NegraCorpusReader import NegraCorpusReader
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    reader = NegraCorpusReader(sys.argv[1], [sys.argv[2]], encoding='utf-8')
+    trees  = reader.parsed_sents_morph()
+    if len(sys.argv) > 3:
+        trees = trees[:int(sys.argv[3])]
+    trees  = list(trees)
+    print('%d trees' % len(trees))
+    for name, (size, dump_time, load_time) in sorted(benchmark(trees).items()):
+        print('%-15s %10d bytes  dump %8.3f s  load %8.3f s' %
+              (name, size, dump_time, load_time))